@@ -0,0 +1,77 @@
+import hashlib
+import os
+from typing import NamedTuple
+
+import numpy as np
+import soundfile as sf
+
+
+# Write every intermediate stage to disk next to the MIDI (debugging only)
+DEBUG_INTERMEDIATES = os.getenv("AUDIO_DEBUG", "0") == "1"
+
+
+class AudioBuffer(NamedTuple):
+    samples: np.ndarray     # float32, (frames,) for mono or (frames, channels)
+    sample_rate: int
+
+    @property
+    def channels(self) -> int:
+        return 1 if self.samples.ndim == 1 else self.samples.shape[1]
+
+    @property
+    def frames(self) -> int:
+        return self.samples.shape[0]
+
+    @property
+    def duration(self) -> float:
+        return self.frames / float(self.sample_rate)
+
+    def to_mono(self) -> "AudioBuffer":
+        if self.samples.ndim == 1:
+            return self
+        return AudioBuffer(self.samples.mean(axis=1, dtype=np.float32), self.sample_rate)
+
+    def digest(self) -> str:
+        # Content hash, for cache keys of anything derived from these samples
+        h = hashlib.sha256(str(self.sample_rate).encode())
+        h.update(np.ascontiguousarray(self.samples, dtype=np.float32).tobytes())
+        return h.hexdigest()
+
+    @classmethod
+    def read(cls, path: str) -> "AudioBuffer":
+        samples, sr = sf.read(path, dtype="float32", always_2d=False)
+        return cls(samples, sr)
+
+    def write(self, path: str, subtype: str = "PCM_16", format: str = None) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        sf.write(path, self.samples, self.sample_rate, subtype=subtype, format=format)
+        return path
+
+
+def as_buffer(src) -> AudioBuffer:
+    # Accepts a file path, an AudioBuffer or a (samples, sample_rate) pair
+    if isinstance(src, AudioBuffer):
+        return src
+    if isinstance(src, (str, os.PathLike)):
+        if not os.path.exists(src):
+            raise FileNotFoundError(src)
+        return AudioBuffer.read(src)
+
+    samples, sr = src
+    return AudioBuffer(np.asarray(samples, dtype=np.float32), int(sr))
+
+
+def iter_blocks(buf: AudioBuffer, block_frames: int):
+    for start in range(0, buf.frames, block_frames):
+        yield AudioBuffer(buf.samples[start:start + block_frames], buf.sample_rate)
+
+
+def read_blocks(path: str, block_seconds: float):
+    with sf.SoundFile(path) as f:
+        for samples in f.blocks(blocksize=max(1, int(block_seconds * f.samplerate)), dtype="float32"):
+            yield AudioBuffer(samples, f.samplerate)
+
+
+def debug_dump(buf: AudioBuffer, path: str):
+    if DEBUG_INTERMEDIATES:
+        buf.write(path)
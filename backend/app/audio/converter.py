@@ -1,78 +1,99 @@
 import os
-import pretty_midi
-import soundfile as sf
+import uuid
+
 import numpy as np
+import soundfile as sf
+
+from app.audio.buffer import AudioBuffer, read_blocks
+from app.audio.synth import get_synthesizer
+from app.music.score import Score
+
+
+BLOCK_SECONDS = float(os.getenv("RENDER_BLOCK_SECONDS", "1.0"))
+
+
+def _load_score(midi) -> Score:
+    # midi: path, PrettyMIDI or a prebuilt Score
+    if isinstance(midi, (str, os.PathLike)) and not os.path.exists(midi):
+        raise FileNotFoundError(f"MIDI file not found: {midi}")
+    return Score.from_midi(midi)
+
+
+# ===================== INCREMENTAL RENDER =====================
+# Yields raw (un-normalized) mono AudioBuffers of block_seconds each, so
+# callers can start using the instrumental before the song is fully rendered.
+def render_midi_blocks(midi, block_seconds: float = BLOCK_SECONDS, backend: str = None, sample_rate: int = None):
+    synth = get_synthesizer(backend, sample_rate)
+    yield from synth.render_blocks(_load_score(midi), block_seconds)
+
+
+def midi_to_audio(midi, on_block=None, backend: str = None, sample_rate: int = None) -> AudioBuffer:
+    # on_block(buf) sees every raw block as soon as it is rendered
+    synth = get_synthesizer(backend, sample_rate)
 
-def midi_to_wav(midi_path: str, wav_path: str):
-    os.makedirs(os.path.dirname(wav_path), exist_ok=True)
+    blocks = []
+    for buf in synth.render_blocks(_load_score(midi), BLOCK_SECONDS):
+        if on_block is not None:
+            on_block(buf)
+        blocks.append(buf.samples)
 
-    # Verify MIDI file exists
-    if not os.path.exists(midi_path):
-        raise FileNotFoundError(f"MIDI file not found: {midi_path}")
+    audio_data = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
 
+    # Normalize audio to prevent clipping
+    max_val = np.abs(audio_data).max() if audio_data.size else 0.0
+    if max_val > 0:
+        audio_data *= 0.8 / max_val  # Scale to 80% to avoid clipping
+
+    return AudioBuffer(audio_data, synth.sample_rate)
+
+
+# ===================== STREAMING RENDER =====================
+# Two passes through disk: raw blocks go to a float scratch file while the
+# peak is tracked, then come back scaled into the 16-bit WAV. Only one block
+# is ever in memory, however long the song.
+def _render_to_file(midi, wav_path: str, on_block=None, backend: str = None, sample_rate: int = None):
+    synth = get_synthesizer(backend, sample_rate)
+    os.makedirs(os.path.dirname(wav_path) or ".", exist_ok=True)
+    scratch = f"{wav_path}.{uuid.uuid4().hex}.scratch.wav"
+
+    peak = 0.0
     try:
-        # Load MIDI file using pretty_midi
-        midi_data = pretty_midi.PrettyMIDI(midi_path)
-        
-        # Try to synthesize audio using pretty_midi's fluidsynth method
-        # This uses fluidsynth as a library (not command line)
-        try:
-            audio_data = midi_data.fluidsynth(fs=44100)
-        except (OSError, RuntimeError, AttributeError) as e:
-            # If fluidsynth library is not available, provide helpful error message
-            error_msg = str(e)
-            if "fluidsynth" in error_msg.lower() or "soundfont" in error_msg.lower():
-                raise RuntimeError(
-                    "FluidSynth library is required for MIDI to WAV conversion. "
-                    "Please install it:\n"
-                    "Windows: Download from https://www.fluidsynth.org/ or use: pip install pyfluidsynth\n"
-                    "Or install fluidsynth system package and ensure it's in PATH."
-                )
-            else:
-                raise RuntimeError(f"Failed to synthesize audio: {error_msg}")
-        
-        # Convert to mono if stereo (soundfile expects specific format)
-        if len(audio_data.shape) > 1:
-            audio_data = np.mean(audio_data, axis=1)
-        
-        # Normalize audio to prevent clipping
-        max_val = np.abs(audio_data).max()
-        if max_val > 0:
-            audio_data = audio_data / max_val * 0.8  # Scale to 80% to avoid clipping
-        
-        # Save as WAV file using soundfile
-        sf.write(wav_path, audio_data, 44100)
-        
+        with sf.SoundFile(scratch, "w", samplerate=synth.sample_rate, channels=1, format="WAV", subtype="FLOAT") as raw:
+            for buf in synth.render_blocks(_load_score(midi), BLOCK_SECONDS):
+                if on_block is not None:
+                    on_block(buf)
+                if buf.frames:
+                    peak = max(peak, float(np.abs(buf.samples).max()))
+                raw.write(buf.samples)
+
+        # Same 80% normalization as midi_to_audio
+        gain = 0.8 / peak if peak > 0 else 1.0
+        with sf.SoundFile(wav_path, "w", samplerate=synth.sample_rate, channels=1, subtype="PCM_16") as out:
+            for buf in read_blocks(scratch, BLOCK_SECONDS):
+                out.write(buf.samples * gain)
+    finally:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+    return wav_path
+
+
+def midi_to_wav(midi, wav_path: str = None, on_block=None, backend: str = None, sample_rate: int = None):
+    # Returns the rendered AudioBuffer when no wav_path is given; with a path
+    # the song streams to disk and memory use does not grow with its length
+    try:
+        if wav_path is None:
+            return midi_to_audio(midi, on_block=on_block, backend=backend, sample_rate=sample_rate)
+
+        _render_to_file(midi, wav_path, on_block=on_block, backend=backend, sample_rate=sample_rate)
+
         # Verify WAV file was created
         if not os.path.exists(wav_path):
             raise RuntimeError(f"WAV file was not created: {wav_path}")
-        
+
         return wav_path
-    except ImportError:
-        # If soundfile is not available, try using scipy
-        try:
-            from scipy.io import wavfile
-            midi_data = pretty_midi.PrettyMIDI(midi_path)
-            audio_data = midi_data.fluidsynth(fs=44100)
-            
-            if len(audio_data.shape) > 1:
-                audio_data = np.mean(audio_data, axis=1)
-            
-            max_val = np.abs(audio_data).max()
-            if max_val > 0:
-                audio_data = (audio_data / max_val * 0.8 * 32767).astype(np.int16)
-            
-            wavfile.write(wav_path, 44100, audio_data)
-            
-            if not os.path.exists(wav_path):
-                raise RuntimeError(f"WAV file was not created: {wav_path}")
-            
-            return wav_path
-        except ImportError:
-            raise RuntimeError("Neither soundfile nor scipy is installed. Please install one: pip install soundfile or pip install scipy")
     except Exception as e:
         # Clean up partial file if it exists
-        if os.path.exists(wav_path):
+        if wav_path and os.path.exists(wav_path):
             try:
                 os.remove(wav_path)
             except:
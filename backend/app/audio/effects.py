@@ -0,0 +1,328 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import soundfile as sf
+
+
+# ===================== BLOCK EFFECTS =====================
+# Stateful effects over (frames, channels) float32 blocks. process() takes
+# any block length and returns the same length, so a song streams through
+# in fixed-size blocks at constant memory; flush() plays out the tails
+# (reverb, delays) once the input has ended.
+REVERB_PARTITION = int(os.getenv("REVERB_PARTITION", "1024"))
+
+
+def _as2d(block: np.ndarray) -> np.ndarray:
+    block = np.asarray(block, dtype=np.float32)
+    return block[:, None] if block.ndim == 1 else block
+
+
+def db_to_gain(db: float) -> float:
+    return float(10 ** (db / 20))
+
+
+class Effect:
+    tail = 0  # frames of output still to come after the last input frame
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class Gain(Effect):
+    def __init__(self, db: float):
+        self.gain = np.float32(db_to_gain(db))
+
+    def process(self, block):
+        return _as2d(block) * self.gain
+
+
+# ===================== EQ =====================
+# RBJ cookbook biquads run as one second-order-section cascade with carried
+# filter state, so block boundaries are seamless.
+def _biquad(kind: str, freq: float, q: float, gain_db: float, sr: int):
+    A = 10 ** (gain_db / 40)
+    w0 = 2 * np.pi * freq / sr
+    cos, alpha = np.cos(w0), np.sin(w0) / (2 * q)
+    sq = 2 * np.sqrt(A) * alpha
+
+    if kind == "peak":
+        b = [1 + alpha * A, -2 * cos, 1 - alpha * A]
+        a = [1 + alpha / A, -2 * cos, 1 - alpha / A]
+    elif kind == "lowshelf":
+        b = [A * ((A + 1) - (A - 1) * cos + sq), 2 * A * ((A - 1) - (A + 1) * cos), A * ((A + 1) - (A - 1) * cos - sq)]
+        a = [(A + 1) + (A - 1) * cos + sq, -2 * ((A - 1) + (A + 1) * cos), (A + 1) + (A - 1) * cos - sq]
+    elif kind == "highshelf":
+        b = [A * ((A + 1) + (A - 1) * cos + sq), -2 * A * ((A - 1) + (A + 1) * cos), A * ((A + 1) + (A - 1) * cos - sq)]
+        a = [(A + 1) - (A - 1) * cos + sq, 2 * ((A - 1) - (A + 1) * cos), (A + 1) - (A - 1) * cos - sq]
+    elif kind == "highpass":
+        b = [(1 + cos) / 2, -(1 + cos), (1 + cos) / 2]
+        a = [1 + alpha, -2 * cos, 1 - alpha]
+    elif kind == "lowpass":
+        b = [(1 - cos) / 2, 1 - cos, (1 - cos) / 2]
+        a = [1 + alpha, -2 * cos, 1 - alpha]
+    else:
+        raise ValueError(f"Unknown EQ band '{kind}'")
+
+    return np.array(b + a) / a[0]
+
+
+class EQ(Effect):
+    # bands: [(kind, freq Hz, Q, gain dB)], kind in peak / lowshelf /
+    # highshelf / highpass / lowpass (gain unused for the passes)
+    def __init__(self, sr: int, channels: int, bands):
+        # scipy.signal takes ~1s to import; only pay for it when filtering
+        from scipy.signal import sosfilt
+
+        self._sosfilt = sosfilt
+        self.sos = np.array([_biquad(kind, f, q, g, sr) for kind, f, q, g in bands])
+        self._zi = np.zeros((len(self.sos), 2, channels))
+
+    def process(self, block):
+        block = _as2d(block)
+        if not len(self.sos):
+            return block
+        out, self._zi = self._sosfilt(self.sos, block, axis=0, zi=self._zi)
+        return out.astype(np.float32, copy=False)
+
+
+# ===================== DYNAMICS =====================
+# The gain computer runs at control rate (one value per `hop` frames, from
+# the hop's peak across channels), smoothed with separate attack / release,
+# then interpolated back to per-frame gains. Only the short control loop is
+# Python; everything per frame is vectorized. Block sizes that are a multiple
+# of the hop give exactly the same output however the stream is split.
+class Compressor(Effect):
+    def __init__(self, sr: int, threshold_db: float = -18.0, ratio: float = 3.0, attack_ms: float = 5.0,
+                 release_ms: float = 120.0, makeup_db: float = 0.0, hop: int = 64, limit: bool = False):
+        self.threshold_db = threshold_db
+        self.slope = 1.0 - 1.0 / ratio
+        self.hop = hop
+        self.makeup_db = makeup_db
+        self.limit = limit
+        self._attack = float(np.exp(-hop / (attack_ms / 1000.0 * sr)))
+        self._release = float(np.exp(-hop / (release_ms / 1000.0 * sr)))
+        self._gr = 0.0       # current gain reduction (dB, <= 0)
+
+    def process(self, block):
+        block = _as2d(block)
+        n = block.shape[0]
+        if not n:
+            return block
+
+        hops = -(-n // self.hop)
+        peak = np.abs(block).max(axis=1)
+        peak = np.pad(peak, (0, hops * self.hop - n)).reshape(hops, self.hop).max(axis=1)
+        level_db = 20 * np.log10(np.maximum(peak, 1e-9))
+        target = -np.maximum(level_db - self.threshold_db, 0.0) * self.slope
+
+        smoothed = np.empty(hops)
+        gr, attack, release = self._gr, self._attack, self._release
+        for i, t in enumerate(target.tolist()):
+            a = attack if t < gr else release
+            gr = a * gr + (1 - a) * t
+            smoothed[i] = gr
+
+        # Control values sit at the end of each hop, ramping from the last block's
+        gain_db = np.interp(np.arange(n), np.arange(hops + 1) * self.hop - 1, np.concatenate([[self._gr], smoothed]))
+        self._gr = gr
+        if self.limit:
+            # Never let a hop through above the threshold, whatever the attack
+            gain_db = np.minimum(gain_db, np.repeat(target, self.hop)[:n])
+
+        gain = np.power(10.0, (gain_db + self.makeup_db) / 20).astype(np.float32)
+        return block * gain[:, None]
+
+
+def Limiter(sr: int, ceiling_db: float = -1.0, release_ms: float = 60.0) -> Compressor:
+    return Compressor(sr, threshold_db=ceiling_db, ratio=np.inf, attack_ms=1.0, release_ms=release_ms, hop=32, limit=True)
+
+
+# ===================== DELAY =====================
+class MultiTapDelay(Effect):
+    # taps: [(delay seconds, gain)], summed onto the dry signal
+    def __init__(self, sr: int, channels: int, taps, dry: float = 1.0):
+        self.taps = [(int(round(d * sr)), np.float32(g)) for d, g in taps if int(round(d * sr)) > 0]
+        self.dry = np.float32(dry)
+        self.tail = max((d for d, _ in self.taps), default=0)
+        self._history = np.zeros((self.tail, channels), dtype=np.float32)
+
+    def process(self, block):
+        block = _as2d(block)
+        n = block.shape[0]
+        if not self.taps:
+            return block * self.dry
+
+        signal = np.concatenate([self._history, block])
+        out = block * self.dry
+        for d, g in self.taps:
+            out += g * signal[self.tail - d:self.tail - d + n]
+        self._history = signal[-self.tail:]
+        return out
+
+
+# ===================== CONVOLUTION REVERB =====================
+# Uniformly partitioned overlap-save: the impulse response is cut into
+# REVERB_PARTITION-frame parts whose spectra are computed once and cached;
+# each input partition costs one FFT, one multiply-accumulate over all parts
+# and one inverse FFT. The one-partition processing latency is taken out of
+# the impulse response's pre-delay, so the wet signal lands on time.
+def synthetic_ir(sr: int, channels: int, seconds: float = 1.6, rt60: float = 1.2,
+                 predelay: float = 0.03, seed: int = 7) -> np.ndarray:
+    # Decaying noise tail (decorrelated per channel) after a few early reflections
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    t = np.arange(n) / sr
+    ir = rng.standard_normal((n, channels)) * np.exp(-6.91 * t / rt60)[:, None]
+
+    # Darker as it decays: a short moving average on the late part
+    k = 8
+    late = np.cumsum(ir, axis=0)
+    late[k:] = (late[k:] - late[:-k]) / k
+    mix = np.minimum(t / rt60, 1.0)[:, None]
+    ir = ir * (1 - mix) + late * mix
+
+    for delay, gain in ((0.011, 0.5), (0.019, 0.35), (0.027, 0.25)):
+        ir[int(delay * sr)] += gain
+
+    ir = np.concatenate([np.zeros((int(predelay * sr), channels)), ir])
+    return (ir / np.sqrt((ir ** 2).sum(axis=0))).astype(np.float32)
+
+
+@lru_cache(maxsize=32)
+def _ir_spectra(source, partition: int) -> np.ndarray:
+    # source: ("synthetic", sr, channels, seconds, rt60, predelay) or ("file", path, mtime, channels)
+    if source[0] == "file":
+        _, path, _, channels = source
+        ir, _ = sf.read(path, dtype="float32", always_2d=True)
+        if ir.shape[1] != channels:
+            ir = np.repeat(ir[:, :1], channels, axis=1) if ir.shape[1] == 1 else ir[:, :channels]
+    else:
+        _, sr, channels, seconds, rt60, predelay = source
+        ir = synthetic_ir(sr, channels, seconds, rt60, predelay)
+
+    # Latency compensation: the first partition's worth of pre-delay is
+    # already added by the block processing
+    ir = ir[min(partition, _leading_silence(ir)):]
+
+    parts = -(-ir.shape[0] // partition)
+    ir = np.pad(ir, ((0, parts * partition - ir.shape[0]), (0, 0)))
+    spectra = np.fft.rfft(ir.reshape(parts, partition, -1), n=2 * partition, axis=1).astype(np.complex64)
+    spectra.flags.writeable = False
+    return spectra
+
+
+def _leading_silence(ir: np.ndarray) -> int:
+    nonzero = np.flatnonzero(np.abs(ir).max(axis=1) > 0)
+    return int(nonzero[0]) if len(nonzero) else 0
+
+
+class ConvolutionReverb(Effect):
+    def __init__(self, sr: int, channels: int, wet: float = 0.2, dry: float = 1.0, ir_path: str = None,
+                 seconds: float = 1.6, rt60: float = 1.2, predelay: float = 0.03, partition: int = REVERB_PARTITION):
+        if ir_path:
+            source = ("file", os.path.abspath(ir_path), os.path.getmtime(ir_path), channels)
+        else:
+            source = ("synthetic", sr, channels, seconds, rt60, predelay)
+        H = _ir_spectra(source, partition)
+
+        self.B = partition
+        self.P = H.shape[0]
+        # Reversed and doubled: the parts lined up against the ring of past
+        # input spectra are then always one contiguous slice (no copies)
+        self._H = np.concatenate([H[::-1], H[::-1]])
+        self.wet = np.float32(wet)
+        self.dry = np.float32(dry)
+        self.tail = self.P * self.B + self.B
+
+        self._fdl = np.zeros((self.P,) + H.shape[1:], dtype=np.complex64)
+        self._t = 0
+        self._prev = np.zeros((self.B, channels), dtype=np.float32)
+        self._in = np.zeros((0, channels), dtype=np.float32)
+        # One partition of latency, pre-filled with silence
+        self._out = np.zeros((self.B, channels), dtype=np.float32)
+
+    def _partition(self, x: np.ndarray) -> np.ndarray:
+        slot = self._t % self.P
+        self._fdl[slot] = np.fft.rfft(np.concatenate([self._prev, x]), axis=0)
+        start = (self.P - 1 - self._t) % self.P
+        Y = np.einsum("pfc,pfc->fc", self._fdl, self._H[start:start + self.P])
+        self._t += 1
+        self._prev = x
+        return np.fft.irfft(Y, n=2 * self.B, axis=0)[self.B:].astype(np.float32)
+
+    def process(self, block):
+        block = _as2d(block)
+        n = block.shape[0]
+        self._in = np.concatenate([self._in, block])
+
+        ready = self._in.shape[0] // self.B
+        if ready:
+            wet = [self._partition(self._in[i * self.B:(i + 1) * self.B]) for i in range(ready)]
+            self._in = self._in[ready * self.B:]
+            self._out = np.concatenate([self._out] + wet)
+
+        out, self._out = self._out[:n], self._out[n:]
+        if out.shape[0] < n:
+            out = np.pad(out, ((0, n - out.shape[0]), (0, 0)))
+        return block * self.dry + out * self.wet
+
+
+# ===================== CHAIN =====================
+class EffectChain(Effect):
+    def __init__(self, effects):
+        self.effects = list(effects)
+        self.tail = sum(e.tail for e in self.effects)
+
+    def process(self, block):
+        block = _as2d(block)
+        for effect in self.effects:
+            block = effect.process(block)
+        return block
+
+    def flush(self, channels: int, block_size: int = 8192):
+        # Yields the tails: silence pushed through until everything has rung out
+        remaining = self.tail
+        while remaining > 0:
+            n = min(block_size, remaining)
+            yield self.process(np.zeros((n, channels), dtype=np.float32))
+            remaining -= n
+
+    def stream(self, blocks, channels: int):
+        # Streaming API: processed blocks in, then the tails
+        for block in blocks:
+            yield self.process(block)
+        yield from self.flush(channels)
+
+    def run(self, samples: np.ndarray, block_size: int = 8192) -> np.ndarray:
+        # Whole buffer in, whole buffer (plus tails) out, still block by block
+        x = _as2d(samples)
+        blocks = (x[i:i + block_size] for i in range(0, x.shape[0], block_size))
+        out = np.concatenate(list(self.stream(blocks, x.shape[1])) or [x[:0]])
+        return out[:, 0] if np.ndim(samples) == 1 else out
+
+
+# ===================== PRESETS =====================
+def vocal_chain(sr: int, channels: int, gain_db: float = 0.0, reverb_wet: float = 0.18) -> EffectChain:
+    # Clean up lows, tame mud, add presence, even out, then a small room
+    return EffectChain([
+        EQ(sr, channels, [("highpass", 90, 0.707, 0), ("peak", 300, 1.0, -2.0), ("peak", 3000, 1.0, 3.0)]),
+        Compressor(sr, threshold_db=-20, ratio=3.0, attack_ms=5, release_ms=120, makeup_db=gain_db),
+        ConvolutionReverb(sr, channels, wet=reverb_wet, seconds=1.4, rt60=1.1),
+    ])
+
+
+def echo_chain(sr: int, channels: int) -> EffectChain:
+    # The "echo" singing tier: two short slapbacks, kept under full scale
+    return EffectChain([
+        MultiTapDelay(sr, channels, [(0.065, 0.22), (0.130, 0.12)]),
+        Limiter(sr, ceiling_db=-0.2),
+    ])
+
+
+def master_chain(sr: int, channels: int) -> EffectChain:
+    return EffectChain([
+        EQ(sr, channels, [("lowshelf", 100, 0.707, 1.0), ("highshelf", 10000, 0.707, 1.5)]),
+        Compressor(sr, threshold_db=-14, ratio=2.0, attack_ms=20, release_ms=200),
+        Limiter(sr, ceiling_db=-1.0),
+    ])
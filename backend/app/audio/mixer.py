@@ -1,11 +1,248 @@
-from pydub import AudioSegment
+import os
+from math import gcd
 
-def merge_audio(inst_path, vocal_path, out_path):
-    inst = AudioSegment.from_file(inst_path)
-    voc = AudioSegment.from_file(vocal_path)
+import numpy as np
+import soundfile as sf
 
-    voc = voc + 4
-    final = inst.overlay(voc)
+from app.audio.buffer import AudioBuffer
+from app.audio.effects import db_to_gain, master_chain, vocal_chain
 
-    final.export(out_path, format="wav")
-    return out_path
+
+VOCAL_GAIN_DB = 4.0
+BLOCK_SIZE = 65536      # frames mixed per chunk (bounds memory on long tracks)
+LIMIT_THRESHOLD = 0.9   # soft limiter knee, peaks above this are bent under 1.0
+
+# Vocal bus (EQ, compressor, reverb) and master bus (EQ, glue compressor,
+# limiter); MIX_EFFECTS=0 falls back to a flat vocal gain
+MIX_EFFECTS = os.getenv("MIX_EFFECTS", "1") == "1"
+
+
+def soft_limit(x: np.ndarray, threshold: float = LIMIT_THRESHOLD) -> np.ndarray:
+    # Stateless, so chunks can be limited independently; leaves quiet parts untouched
+    mag = np.abs(x)
+    over = mag > threshold
+    if over.any():
+        head = 1.0 - threshold
+        x[over] = np.sign(x[over]) * (threshold + head * np.tanh((mag[over] - threshold) / head))
+    return x
+
+
+# ===================== SOURCES =====================
+# A source is a file path or an in-memory AudioBuffer / (samples, sample_rate) pair.
+def _source_info(src):
+    if isinstance(src, (str, os.PathLike)):
+        info = sf.info(src)
+        return info.samplerate, info.channels
+
+    samples, sr = src
+    samples = np.asarray(samples)
+    return int(sr), (1 if samples.ndim == 1 else samples.shape[1])
+
+
+def _iter_source(src, block_size: int):
+    if isinstance(src, (str, os.PathLike)):
+        with sf.SoundFile(src) as f:
+            for block in f.blocks(blocksize=block_size, dtype="float32", always_2d=True):
+                yield block
+        return
+
+    samples = np.asarray(src[0], dtype=np.float32)
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    for start in range(0, samples.shape[0], block_size):
+        yield samples[start:start + block_size]
+
+
+# ===================== RESAMPLING =====================
+class _StreamResampler:
+    # Chunked resample_poly: each chunk is filtered with enough context on
+    # both sides that the output matches resampling the whole signal at once.
+    def __init__(self, sr_in: int, sr_out: int):
+        g = gcd(sr_in, sr_out)
+        self.up = sr_out // g
+        self.down = sr_in // g
+
+        # resample_poly's FIR reaches ~10 input samples either side;
+        # context is kept in multiples of `down` so output indices stay integral
+        reach = 10 * max(self.up, self.down) // self.up + 1
+        self.context = -(-reach // self.down) * self.down
+
+        # scipy.signal takes ~1s to import; only pay for it when resampling
+        from scipy.signal import firwin
+
+        # Same anti-aliasing filter resample_poly designs, built once per stream
+        max_rate = max(self.up, self.down)
+        self._fir = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+
+        self._buf = None      # input not yet fully consumed
+        self._emitted = 0     # input frames already turned into output
+        self._buf_start = 0   # global index of _buf[0]
+
+    def _resample(self, end: int, emit: int, final: bool = False):
+        left = self._emitted - self._buf_start
+        seg = self._buf[:end - self._buf_start]
+        from scipy.signal import resample_poly
+
+        y = resample_poly(seg, self.up, self.down, axis=0, window=self._fir)
+        offset = left * self.up // self.down
+        if final:
+            return y[offset:]
+        return y[offset:offset + emit * self.up // self.down]
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        self._buf = block if self._buf is None else np.concatenate([self._buf, block])
+
+        available = self._buf_start + self._buf.shape[0] - self._emitted - self.context
+        emit = (available // self.down) * self.down
+        if emit <= 0:
+            return self._buf[:0]
+
+        out = self._resample(self._emitted + emit + self.context, emit)
+        self._emitted += emit
+
+        # Keep only the left context needed by the next chunk
+        keep_from = max(self._emitted - self.context, 0)
+        self._buf = self._buf[keep_from - self._buf_start:]
+        self._buf_start = keep_from
+        return out
+
+    def flush(self) -> np.ndarray:
+        if self._buf is None or self._buf_start + self._buf.shape[0] <= self._emitted:
+            return np.zeros((0, 0 if self._buf is None else self._buf.shape[1]), dtype=np.float32)
+        return self._resample(self._buf_start + self._buf.shape[0], 0, final=True)
+
+
+def _resampled_blocks(src, sr_out: int, block_size: int):
+    sr_in, _ = _source_info(src)
+    if sr_in == sr_out:
+        yield from _iter_source(src, block_size)
+        return
+
+    resampler = _StreamResampler(sr_in, sr_out)
+    for block in _iter_source(src, block_size):
+        out = resampler.process(block)
+        if out.shape[0]:
+            yield out.astype(np.float32, copy=False)
+    tail = resampler.flush()
+    if tail.shape[0]:
+        yield tail.astype(np.float32, copy=False)
+
+
+class _FrameReader:
+    # Re-chunks a block stream into exact frame counts
+    def __init__(self, blocks):
+        self._blocks = blocks
+        self._pending = []
+        self._count = 0
+
+    def read(self, n: int):
+        while self._count < n:
+            block = next(self._blocks, None)
+            if block is None:
+                break
+            self._pending.append(block)
+            self._count += block.shape[0]
+
+        if not self._pending:
+            return None
+
+        data = self._pending[0] if len(self._pending) == 1 else np.concatenate(self._pending)
+        out, rest = data[:n], data[n:]
+        self._pending = [rest] if rest.shape[0] else []
+        self._count = rest.shape[0]
+        return out
+
+
+def _match_channels(block: np.ndarray, channels: int) -> np.ndarray:
+    if block.shape[1] == channels:
+        return block
+    if block.shape[1] == 1:
+        return np.repeat(block, channels, axis=1)
+    return block.mean(axis=1, keepdims=True)
+
+
+# ===================== MIX =====================
+def merge_audio(inst, vocal, out_path=None, vocal_gain_db: float = VOCAL_GAIN_DB, block_size: int = BLOCK_SIZE,
+                effects: bool = None):
+    # inst / vocal: WAV (or any libsndfile format) paths or AudioBuffers.
+    # Mixes at the higher sample rate / channel count of the two, runs for the
+    # longer of the two (plus the vocal reverb tail) and soft-limits peaks.
+    # Writes 16-bit WAV to out_path, or returns an AudioBuffer when out_path is None.
+    inst_sr, inst_ch = _source_info(inst)
+    voc_sr, voc_ch = _source_info(vocal)
+    sr = max(inst_sr, voc_sr)
+    channels = max(inst_ch, voc_ch)
+    effects = MIX_EFFECTS if effects is None else effects
+
+    if effects:
+        vocal_fx = vocal_chain(sr, channels, gain_db=vocal_gain_db)
+        master_fx = master_chain(sr, channels)
+    else:
+        gain = db_to_gain(vocal_gain_db)
+        vocal_fx = master_fx = None
+
+    inst_reader = _FrameReader(_resampled_blocks(inst, sr, block_size))
+    voc_reader = _FrameReader(_resampled_blocks(vocal, sr, block_size))
+
+    writer = None
+    chunks = []
+    if out_path is not None:
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        writer = sf.SoundFile(out_path, "w", samplerate=sr, channels=channels, subtype="PCM_16")
+
+    def _emit(out):
+        if master_fx is not None:
+            out = master_fx.process(out)
+        soft_limit(out)
+        if writer is not None:
+            writer.write(out)
+        else:
+            chunks.append(out)
+
+    # Frames of vocal-bus output still ringing out after the vocal ended
+    ringing = 0 if vocal_fx is None else vocal_fx.tail
+    vocal_done = False
+
+    try:
+        while True:
+            a = inst_reader.read(block_size)
+            b = None if vocal_done else voc_reader.read(block_size)
+            if a is None and b is None:
+                break
+
+            n = max(0 if a is None else a.shape[0], 0 if b is None else b.shape[0])
+            out = np.zeros((n, channels), dtype=np.float32)
+            if a is not None:
+                out[:a.shape[0]] += _match_channels(a, channels)
+
+            if vocal_fx is None:
+                if b is not None:
+                    out[:b.shape[0]] += _match_channels(b, channels) * gain
+            elif ringing > 0:
+                # The vocal bus is fed silence past the vocal's end until its tail has played
+                v = np.zeros((n, channels), dtype=np.float32)
+                if b is not None:
+                    v[:b.shape[0]] = _match_channels(b, channels)
+                if b is None or b.shape[0] < n:
+                    ringing -= n - (0 if b is None else b.shape[0])
+                out += vocal_fx.process(v)
+
+            vocal_done = vocal_done or b is None or b.shape[0] < n
+            _emit(out)
+
+        if vocal_fx is not None:
+            for block in vocal_fx.flush(channels, block_size):
+                if ringing <= 0:
+                    break
+                block = block[:ringing]
+                ringing -= block.shape[0]
+                _emit(block)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if out_path is not None:
+        return out_path
+
+    mixed = np.concatenate(chunks) if chunks else np.zeros((0, channels), dtype=np.float32)
+    return AudioBuffer(mixed[:, 0] if channels == 1 else mixed, sr)
@@ -1,43 +1,59 @@
 import os
+import sys
 
-import numpy as np
-import soundfile as sf
+from app.audio.buffer import as_buffer
+from app.audio.effects import echo_chain
+
+
+# "echo": light ambience on the speech, no pitch change (cheapest)
+# "fast" / "quality": WORLD resynthesis following the melody (tts_to_singing)
+SINGING_TIERS = ("echo", "fast", "quality")
+SINGING_TIER = os.getenv("SINGING_TIER", "fast")
 
 
 def speech_to_singing(
-    speech_wav: str,
+    speech,
     midi_path: str,
-    out_path: str,
+    out_path: str = None,
     voice: str = "male",
-) -> str:
-    if not os.path.exists(speech_wav):
-        raise FileNotFoundError(speech_wav)
-
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+):
+    # speech: WAV path or AudioBuffer. Returns an AudioBuffer unless out_path is given.
+    if isinstance(speech, (str, os.PathLike)) and not os.path.exists(speech):
+        raise FileNotFoundError(speech)
 
     # Read WAV (no pitch shifting here — pitch shifting is what causes "robotic")
-    y, sr = sf.read(speech_wav, always_2d=False)
-
     # Ensure mono
-    if isinstance(y, np.ndarray) and y.ndim == 2:
-        y = np.mean(y, axis=1)
+    speech = as_buffer(speech).to_mono()
+    sr = speech.sample_rate
+
+    # Light "singing" polish: two slapback echoes, limited instead of peak
+    # normalized so the whole clip streams through in blocks
+    y_out = echo_chain(sr, 1).run(speech.samples)
+
+    vocal = speech._replace(samples=y_out)
+    if out_path is None:
+        return vocal
+    return vocal.write(out_path)
+
 
-    # Light "singing" polish: small echo / ambience (cheap + non-robotic)
-    y_out = y.astype(np.float32, copy=True)
+def sing(speech, midi, voice: str = "male", tier: str = None, analysis_key: str = None):
+    # midi: path, PrettyMIDI or Score. Returns an AudioBuffer.
+    # analysis_key: identifies the speech (lyrics + voice) so its WORLD
+    # analysis is reused when only the melody changes
+    tier = tier or SINGING_TIER
+    if tier not in SINGING_TIERS:
+        raise ValueError(f"Unknown singing tier '{tier}', choose from {list(SINGING_TIERS)}")
+    if tier == "echo":
+        return speech_to_singing(speech, midi, voice=voice)
 
-    def _add_echo(x: np.ndarray, delay_s: float, decay: float) -> None:
-        n = int(delay_s * sr)
-        if n <= 0 or n >= x.shape[0]:
-            return
-        x[n:] += decay * x[:-n]
+    # pyworld / scipy.signal load on first use, not at startup
+    from app.audio.tts_to_singing import tts_to_singing
 
-    _add_echo(y_out, delay_s=0.065, decay=0.22)
-    _add_echo(y_out, delay_s=0.130, decay=0.12)
+    return tts_to_singing(speech, midi, tier=tier, analysis_key=analysis_key)
 
-    # Prevent clipping
-    peak = float(np.max(np.abs(y_out))) if y_out.size else 0.0
-    if peak > 1.0:
-        y_out = y_out / peak * 0.98
 
-    sf.write(out_path, y_out, sr)
-    return out_path
+def shutdown():
+    # Stop the WORLD analysis pool, if this process ever started it
+    module = sys.modules.get("app.audio.tts_to_singing")
+    if module is not None:
+        module.shutdown()
@@ -0,0 +1,296 @@
+import os
+import queue
+import threading
+
+import numpy as np
+import pretty_midi
+
+from app.audio.buffer import AudioBuffer
+from app.music.score import Score, pitch_to_hz
+
+
+SAMPLE_RATE = int(os.getenv("SYNTH_SAMPLE_RATE", "44100"))
+SYNTH_BACKEND = os.getenv("SYNTH_BACKEND", "fluidsynth")
+
+# TimGM6mb ships inside the pretty_midi package
+SOUNDFONT_PATH = os.getenv(
+    "SOUNDFONT_PATH",
+    os.path.join(os.path.dirname(pretty_midi.__file__), "TimGM6mb.sf2"),
+)
+
+FLUIDSYNTH_HELP = (
+    "FluidSynth library is required for MIDI to WAV conversion. "
+    "Please install it:\n"
+    "Windows: Download from https://www.fluidsynth.org/ or use: pip install pyfluidsynth\n"
+    "Or install fluidsynth system package and ensure it's in PATH.\n"
+    "Or set SYNTH_BACKEND=additive to use the built-in NumPy synthesizer."
+)
+
+# Seconds rendered after the last note so releases ring out
+TAIL_SECONDS = 1.0
+
+
+class Synthesizer:
+    name = "base"
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+
+    def _total_frames(self, score: Score) -> int:
+        return int(np.ceil((score.end_time + TAIL_SECONDS) * self.sample_rate))
+
+    def render_blocks(self, score: Score, block_seconds: float):
+        # Yields raw (un-normalized) mono AudioBuffers of block_seconds each
+        raise NotImplementedError
+
+    def render(self, score: Score) -> AudioBuffer:
+        blocks = [b.samples for b in self.render_blocks(score, block_seconds=10.0)]
+        samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+        return AudioBuffer(samples, self.sample_rate)
+
+
+# ===================== FLUIDSYNTH =====================
+class FluidSynthBackend(Synthesizer):
+    name = "fluidsynth"
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, soundfont: str = SOUNDFONT_PATH):
+        super().__init__(sample_rate)
+        self.soundfont = soundfont
+        # Idle synths with the soundfont already loaded, reused across songs
+        self._idle = queue.LifoQueue()
+
+    def _new_synth(self):
+        try:
+            import fluidsynth
+        except (ImportError, OSError) as e:
+            raise RuntimeError(FLUIDSYNTH_HELP) from e
+
+        if not os.path.exists(self.soundfont):
+            raise RuntimeError(f"Soundfont not found: {self.soundfont}")
+
+        synth = fluidsynth.Synth(samplerate=float(self.sample_rate))
+        sfid = synth.sfload(self.soundfont)
+        if sfid == -1:
+            synth.delete()
+            raise RuntimeError(f"Failed to load soundfont: {self.soundfont}")
+        return synth, sfid
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_synth()
+
+    def _release(self, synth, sfid):
+        # Silence anything still ringing before the next song uses it
+        reset = getattr(synth, "system_reset", None)
+        if reset is not None:
+            reset()
+        else:
+            for channel in range(16):
+                synth.cc(channel, 120, 0)  # all sound off
+                synth.cc(channel, 121, 0)  # reset controllers
+        self._idle.put((synth, sfid))
+
+    @staticmethod
+    def _events(score: Score):
+        # (sample-time seconds, order, kind, channel, a, b); note-offs sort first
+        notes = score.notes
+        instruments = sorted({(int(p), bool(d)) for p, d in zip(notes["program"], notes["is_drum"])})
+        melodic = [c for c in range(16) if c != 9]
+        channels = {}
+        events = []
+        for i, (program, is_drum) in enumerate(instruments):
+            channel = 9 if is_drum else melodic[i % len(melodic)]
+            channels[(program, is_drum)] = channel
+            events.append((0.0, 0, "program", channel, program, is_drum))
+
+        for n in notes:
+            channel = channels[(int(n["program"]), bool(n["is_drum"]))]
+            events.append((float(n["start"]), 2, "note on", channel, int(n["pitch"]), int(n["velocity"])))
+            events.append((float(n["end"]), 1, "note off", channel, int(n["pitch"]), 0))
+
+        events.sort(key=lambda e: (e[0], e[1]))
+        return events
+
+    def render_blocks(self, score: Score, block_seconds: float):
+        if not len(score):
+            return
+
+        sr = self.sample_rate
+        events = self._events(score)
+        synth, sfid = self._acquire()
+        try:
+            total = self._total_frames(score)
+            block = max(1, int(block_seconds * sr))
+            rendered = 0
+            next_event = 0
+
+            def _pull(n):
+                # pyfluidsynth returns interleaved stereo int16; downmix in
+                # place instead of building a float stereo copy to average
+                stereo = synth.get_samples(n)
+                mono = stereo[0::2].astype(np.float32)
+                mono += stereo[1::2]
+                mono *= 0.5 / 32768.0
+                return mono
+
+            for block_start in range(0, total, block):
+                block_end = min(block_start + block, total)
+                pieces = []
+
+                while next_event < len(events) and int(events[next_event][0] * sr) < block_end:
+                    at = max(int(events[next_event][0] * sr), rendered)
+                    if at > rendered:
+                        pieces.append(_pull(at - rendered))
+                        rendered = at
+
+                    _, _, kind, channel, a, b = events[next_event]
+                    if kind == "note on":
+                        synth.noteon(channel, a, b)
+                    elif kind == "note off":
+                        synth.noteoff(channel, a)
+                    elif kind == "program":
+                        if b:
+                            # Drums: bank 128, fall back to the first kit
+                            if synth.program_select(channel, sfid, 128, a) == -1:
+                                synth.program_select(channel, sfid, 128, 0)
+                        else:
+                            synth.program_select(channel, sfid, 0, a)
+                    next_event += 1
+
+                if block_end > rendered:
+                    pieces.append(_pull(block_end - rendered))
+                    rendered = block_end
+
+                yield AudioBuffer(np.concatenate(pieces), sr)
+        except GeneratorExit:
+            self._release(synth, sfid)
+            raise
+        except BaseException:
+            # A synth in an unknown state is not worth reusing
+            synth.delete()
+            raise
+        else:
+            self._release(synth, sfid)
+
+
+# ===================== ADDITIVE (NumPy) =====================
+# Harmonic amplitudes, attack / decay rate / sustain level / release per
+# GENRE_SETTINGS program family. Plain NumPy: no native dependency and
+# no soundfont, so it also works in tests.
+VOICES = {
+    "piano": {"harmonics": [1.0, 0.45, 0.22, 0.12, 0.06, 0.03], "attack": 0.005, "decay": 3.0, "sustain": 0.0, "release": 0.25},
+    "guitar": {"harmonics": [1.0, 0.6, 0.35, 0.2, 0.12, 0.08, 0.04], "attack": 0.003, "decay": 4.0, "sustain": 0.0, "release": 0.15},
+    "strings": {"harmonics": [1.0 / n for n in range(1, 11)], "attack": 0.08, "decay": 0.0, "sustain": 0.8, "release": 0.2},
+    "default": {"harmonics": [1.0, 0.3, 0.1], "attack": 0.01, "decay": 1.5, "sustain": 0.3, "release": 0.2},
+}
+
+TABLE_SIZE = 4096
+MASTER_GAIN = 0.3
+
+
+def _voice_for(program: int) -> str:
+    if 0 <= program <= 7:
+        return "piano"
+    if 24 <= program <= 31:
+        return "guitar"
+    if 40 <= program <= 51:
+        return "strings"
+    return "default"
+
+
+class AdditiveSynth(Synthesizer):
+    name = "additive"
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        super().__init__(sample_rate)
+        phase = np.arange(TABLE_SIZE + 1) / TABLE_SIZE
+        self._tables = {}
+        for name, voice in VOICES.items():
+            table = sum(a * np.sin(2 * np.pi * (h + 1) * phase) for h, a in enumerate(voice["harmonics"]))
+            # Extra wrap-around sample makes linear interpolation branch-free
+            self._tables[name] = (table / np.abs(table).max()).astype(np.float32)
+
+    def _envelope(self, voice: dict, t: np.ndarray, length: float) -> np.ndarray:
+        attack = np.minimum(t / voice["attack"], 1.0)
+        body = voice["sustain"] + (1.0 - voice["sustain"]) * np.exp(-voice["decay"] * t)
+
+        # Release from the level reached at note-off
+        at_off = voice["sustain"] + (1.0 - voice["sustain"]) * np.exp(-voice["decay"] * length)
+        released = t > length
+        env = attack * body
+        env[released] = at_off * np.maximum(1.0 - (t[released] - length) / voice["release"], 0.0)
+        return env
+
+    def render_blocks(self, score: Score, block_seconds: float):
+        if not len(score):
+            return
+
+        sr = self.sample_rate
+        notes = score.notes[~score.notes["is_drum"]]
+        voices = [_voice_for(int(p)) for p in notes["program"]]
+        releases = np.array([VOICES[v]["release"] for v in voices])
+        freqs = pitch_to_hz(notes["pitch"])
+        gains = notes["velocity"] / 127.0
+        sounding_until = notes["end"] + releases
+
+        # Notes are sorted by start: only those starting within the longest
+        # ring time before the block can reach it, so each block looks at a
+        # bounded slice instead of every note in the song
+        starts = notes["start"]
+        longest = float((sounding_until - starts).max()) if len(notes) else 0.0
+
+        total = self._total_frames(score)
+        block = max(1, int(block_seconds * sr))
+
+        for block_start in range(0, total, block):
+            block_end = min(block_start + block, total)
+            out = np.zeros(block_end - block_start, dtype=np.float32)
+            t0, t1 = block_start / sr, block_end / sr
+
+            lo = np.searchsorted(starts, t0 - longest, side="left")
+            hi = np.searchsorted(starts, t1, side="left")
+            for i in lo + np.nonzero(sounding_until[lo:hi] > t0)[0]:
+                start = notes["start"][i]
+                first = max(block_start, int(np.ceil(start * sr)))
+                last = min(block_end, int(sounding_until[i] * sr))
+                if last <= first:
+                    continue
+
+                # Time since note-on: phase stays continuous across blocks
+                t = np.arange(first, last) / sr - start
+                pos = (t * freqs[i] % 1.0) * TABLE_SIZE
+                idx = pos.astype(np.int64)
+                frac = (pos - idx).astype(np.float32)
+                table = self._tables[voices[i]]
+                wave = table[idx] + (table[idx + 1] - table[idx]) * frac
+
+                env = self._envelope(VOICES[voices[i]], t, notes["end"][i] - start)
+                out[first - block_start:last - block_start] += wave * (env * gains[i] * MASTER_GAIN)
+
+            yield AudioBuffer(out, sr)
+
+
+# ===================== REGISTRY =====================
+BACKENDS = {
+    FluidSynthBackend.name: FluidSynthBackend,
+    AdditiveSynth.name: AdditiveSynth,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_synthesizer(name: str = None, sample_rate: int = None) -> Synthesizer:
+    # One long-lived backend per (name, sample rate) in each worker process
+    name = name or SYNTH_BACKEND
+    sample_rate = sample_rate or SAMPLE_RATE
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown synthesizer backend '{name}', choose from {sorted(BACKENDS)}")
+
+    with _instances_lock:
+        key = (name, sample_rate)
+        if key not in _instances:
+            _instances[key] = BACKENDS[name](sample_rate=sample_rate)
+        return _instances[key]
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import threading
+import uuid
+from functools import lru_cache
+
+import soundfile as sf
+
+from app.audio.mixer import BLOCK_SIZE, _resampled_blocks, _source_info
+
+
+# ===================== DOWNLOAD FORMATS =====================
+# Compressed copies live next to the WAV (song.wav → song.flac / song.ogg /
+# song.opus) and are built on first request.
+FORMATS = {
+    "wav": {"media_type": "audio/wav", "ext": ".wav"},
+    "flac": {"media_type": "audio/flac", "ext": ".flac", "format": "FLAC", "subtype": "PCM_16"},
+    "ogg": {"media_type": "audio/ogg", "ext": ".ogg", "format": "OGG", "subtype": "VORBIS"},
+    # Opus only runs at 48 kHz (or lower telephone rates)
+    "opus": {"media_type": "audio/ogg; codecs=opus", "ext": ".opus", "format": "OGG", "subtype": "OPUS", "sample_rate": 48000},
+}
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def transcoded_path(wav_path: str, fmt: str) -> str:
+    return os.path.splitext(wav_path)[0] + FORMATS[fmt]["ext"]
+
+
+def sibling_paths(wav_path: str):
+    # Every compressed copy that may exist for this WAV
+    return [transcoded_path(wav_path, fmt) for fmt in FORMATS if fmt != "wav"]
+
+
+def _is_fresh(dst: str, src: str) -> bool:
+    return os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src)
+
+
+def transcode(wav_path: str, fmt: str) -> str:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}', choose from {sorted(FORMATS)}")
+    if fmt == "wav":
+        return wav_path
+
+    dst = transcoded_path(wav_path, fmt)
+    if _is_fresh(dst, wav_path):
+        return dst
+
+    # One encode per file even when several downloads race for it
+    with _lock_for(dst):
+        if _is_fresh(dst, wav_path):
+            return dst
+
+        spec = FORMATS[fmt]
+        sr_in, channels = _source_info(wav_path)
+        sr = spec.get("sample_rate", sr_in)
+
+        tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+        try:
+            with sf.SoundFile(tmp, "w", samplerate=sr, channels=channels, format=spec["format"], subtype=spec["subtype"]) as out:
+                for block in _resampled_blocks(wav_path, sr, BLOCK_SIZE):
+                    out.write(block)
+            os.replace(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return dst
+
+
+# ===================== ETAG =====================
+@lru_cache(maxsize=1024)
+def _content_hash(path: str, mtime_ns: int, size: int) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_etag(path: str) -> str:
+    # Strong ETag from the file content, hashed once per (path, mtime, size)
+    st = os.stat(path)
+    return f'"{_content_hash(path, st.st_mtime_ns, st.st_size)}"'
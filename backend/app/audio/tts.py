@@ -1,11 +1,48 @@
+import asyncio
+import io
+import multiprocessing
 import os
-import subprocess
-import sys
+import queue
+import re
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Literal
 
-import pyttsx3
+import numpy as np
+import soundfile as sf
 
+from app.audio.buffer import AudioBuffer
+from app.pipeline.cache import cache_key, render_cache
 
+
+# Engines tried in order until one succeeds ("stub" = deterministic offline
+# voice for tests, never a fallback unless listed)
+TTS_ENGINES = [e.strip() for e in os.getenv("TTS_ENGINES", "edge,pyttsx3").split(",") if e.strip()]
+
+# Requests in flight per engine; callers beyond this wait for a free slot
+EDGE_TTS_CONCURRENCY = int(os.getenv("EDGE_TTS_CONCURRENCY", "4"))
+PYTTSX3_WORKERS = int(os.getenv("PYTTSX3_WORKERS", "1"))
+STUB_CONCURRENCY = int(os.getenv("STUB_TTS_CONCURRENCY", "8"))
+
+EDGE_TTS_TIMEOUT = float(os.getenv("EDGE_TTS_TIMEOUT", "60"))
+# After a failure (offline, service down) skip Edge TTS for this long instead
+# of paying a connection timeout on every request
+EDGE_TTS_RETRY_SECONDS = float(os.getenv("EDGE_TTS_RETRY_SECONDS", "60"))
+PYTTSX3_TIMEOUT = float(os.getenv("PYTTSX3_TIMEOUT", "120"))
+
+# Silence between lines of a section, and between sections
+LINE_GAP_SECONDS = float(os.getenv("TTS_LINE_GAP", "0.25"))
+SECTION_GAP_SECONDS = float(os.getenv("TTS_SECTION_GAP", "0.6"))
+
+
+class TTSError(RuntimeError):
+    pass
+
+
+# ===================== VOICES =====================
 def _choose_voice(engine, voice_type: str):
     voices = engine.getProperty("voices")
     if not voices:
@@ -56,50 +93,404 @@ def _edge_tts_voice(voice: str) -> str:
     return "en-US-JennyNeural"
 
 
+# Tune voice slightly by gender
+PYTTSX3_SETTINGS = {
+    "female": {"rate": 95, "volume": 0.9},     # slower = less metallic
+    "male": {"rate": 110, "volume": 1.0},
+}
+
+
+# ===================== ENGINES =====================
+class TTSEngine:
+    name = "base"
+
+    def __init__(self, max_concurrency: int = 1):
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _synthesize(self, text: str, voice: str) -> AudioBuffer:
+        raise NotImplementedError
+
+    def synthesize(self, text: str, voice: str = "male") -> AudioBuffer:
+        with self._slots:
+            return self._synthesize(text, voice)
+
+    def close(self):
+        pass
+
+
+# ---------- Edge TTS (online, in-process) ----------
+# One long-lived event loop thread runs every request; no interpreter start
+# or package import per call.
+class EdgeTTSEngine(TTSEngine):
+    name = "edge"
+
+    def __init__(self, max_concurrency: int = EDGE_TTS_CONCURRENCY):
+        super().__init__(max_concurrency)
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._failed_at = None
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="edge-tts", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    @staticmethod
+    async def _fetch(text: str, voice: str) -> bytes:
+        import edge_tts  # only the online engine needs it
+
+        audio = bytearray()
+        async for chunk in edge_tts.Communicate(text, _edge_tts_voice(voice)).stream():
+            if chunk["type"] == "audio":
+                audio += chunk["data"]
+        return bytes(audio)
+
+    def _synthesize(self, text: str, voice: str) -> AudioBuffer:
+        if self._failed_at is not None and time.monotonic() - self._failed_at < EDGE_TTS_RETRY_SECONDS:
+            raise TTSError("Edge TTS unavailable (recent failure)")
+
+        future = None
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._fetch(text, voice), self._get_loop())
+            mp3 = future.result(timeout=EDGE_TTS_TIMEOUT)
+            if not mp3:
+                raise TTSError("Edge TTS returned no audio")
+            samples, sr = sf.read(io.BytesIO(mp3), dtype="float32", always_2d=False)
+        except Exception as e:
+            if future is not None:
+                # A timed-out fetch would otherwise keep streaming on the loop
+                future.cancel()
+            self._failed_at = time.monotonic()
+            raise TTSError(f"Edge TTS failed: {e}") from e
+
+        self._failed_at = None
+        return AudioBuffer(samples, sr)
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+
+# ---------- pyttsx3 / eSpeak (offline, worker processes) ----------
+# Each worker process initializes pyttsx3 once and resolves the voice ids
+# once, then serves requests over a pipe. Processes instead of threads:
+# pyttsx3 drivers are not thread safe and can hang in runAndWait.
+def _pyttsx3_worker(conn):
+    import pyttsx3  # offline fallback only; keeps it out of startup
+
+    try:
+        engine = pyttsx3.init()
+        voice_ids = {v: _choose_voice(engine, v) for v in PYTTSX3_SETTINGS}
+    except Exception as e:
+        conn.send(("error", f"pyttsx3 init failed: {e}"))
+        return
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+
+        text, voice, out_path = request
+        try:
+            voice = voice if voice in PYTTSX3_SETTINGS else "male"
+            for prop, value in PYTTSX3_SETTINGS[voice].items():
+                engine.setProperty(prop, value)
+            if voice_ids[voice]:
+                engine.setProperty("voice", voice_ids[voice])
+
+            engine.save_to_file(text, out_path)
+            engine.runAndWait()
+            conn.send(("ok", out_path))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class _Pyttsx3Process:
+    def __init__(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_pyttsx3_worker, args=(child,), name="pyttsx3", daemon=True)
+        self.process.start()
+        child.close()
+
+        status, detail = self._recv()
+        if status != "ready":
+            self.close()
+            raise TTSError(detail)
+
+    def _recv(self):
+        if not self.conn.poll(PYTTSX3_TIMEOUT):
+            raise TTSError("pyttsx3 worker timed out")
+        try:
+            return self.conn.recv()
+        except EOFError as e:
+            raise TTSError("pyttsx3 worker exited") from e
+
+    def speak(self, text: str, voice: str, out_path: str):
+        self.conn.send((text, voice, out_path))
+        status, detail = self._recv()
+        if status != "ok":
+            raise TTSError(f"pyttsx3 failed: {detail}")
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+
+
+class Pyttsx3Engine(TTSEngine):
+    name = "pyttsx3"
+
+    def __init__(self, max_concurrency: int = PYTTSX3_WORKERS):
+        super().__init__(max_concurrency)
+        # Idle workers, reused across requests (at most max_concurrency exist)
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Pyttsx3Process:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            worker = _Pyttsx3Process()
+            with self._lock:
+                self._all.append(worker)
+            return worker
+
+    def _discard(self, worker: _Pyttsx3Process):
+        with self._lock:
+            if worker in self._all:
+                self._all.remove(worker)
+        worker.close()
+
+    def _synthesize(self, text: str, voice: str) -> AudioBuffer:
+        # The engine only writes files, so read the temp file straight back
+        fd, tmp_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        worker = self._acquire()
+        try:
+            worker.speak(text, voice, tmp_path)
+            buf = AudioBuffer.read(tmp_path)
+        except Exception:
+            # A worker in an unknown state is not worth reusing
+            self._discard(worker)
+            raise
+        else:
+            self._idle.put(worker)
+        finally:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return buf
+
+    def close(self):
+        with self._lock:
+            workers, self._all = self._all, []
+        for worker in workers:
+            worker.close()
+
+
+# ---------- Stub (offline, deterministic) ----------
+# A harmonic tone per word, pitch from the word's checksum: same text and
+# voice → identical samples, no network, no system speech engine.
+STUB_SAMPLE_RATE = 22050
+_WORDS = re.compile(r"[\w']+|\.\.\.|[.!?,;]")
+
+
+class StubEngine(TTSEngine):
+    name = "stub"
+    base_f0 = {"male": 120.0, "female": 210.0}
+
+    def __init__(self, max_concurrency: int = STUB_CONCURRENCY, sample_rate: int = STUB_SAMPLE_RATE):
+        super().__init__(max_concurrency)
+        self.sample_rate = sample_rate
+
+    def _synthesize(self, text: str, voice: str) -> AudioBuffer:
+        sr = self.sample_rate
+        f0_base = self.base_f0.get(voice, self.base_f0["male"])
+        pieces = []
+
+        for token in _WORDS.findall(text):
+            if not token[0].isalnum():
+                pause = 0.3 if token in ("...", ".", "!", "?") else 0.12
+                pieces.append(np.zeros(int(pause * sr), dtype=np.float32))
+                continue
+
+            seconds = min(max(0.06 * len(token), 0.15), 0.6)
+            t = np.arange(int(seconds * sr)) / sr
+            f0 = f0_base * 2 ** ((zlib.crc32(token.lower().encode()) % 7 - 3) / 12)
+            tone = sum(np.sin(2 * np.pi * k * f0 * t) / k for k in range(1, 8))
+            envelope = np.sin(np.pi * t / seconds) ** 0.5
+            pieces.append((0.25 * tone * envelope).astype(np.float32))
+            pieces.append(np.zeros(int(0.05 * sr), dtype=np.float32))
+
+        samples = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+        return AudioBuffer(samples, sr)
+
+
+# ===================== REGISTRY =====================
+ENGINES = {
+    EdgeTTSEngine.name: EdgeTTSEngine,
+    Pyttsx3Engine.name: Pyttsx3Engine,
+    StubEngine.name: StubEngine,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+_prefetch_pool = None
+
+
+def get_engine(name: str) -> TTSEngine:
+    # One long-lived engine (and its pool) per name in each process
+    if name not in ENGINES:
+        raise ValueError(f"Unknown TTS engine '{name}', choose from {sorted(ENGINES)}")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = ENGINES[name]()
+        return _instances[name]
+
+
+def shutdown():
+    global _prefetch_pool
+    with _instances_lock:
+        engines = list(_instances.values())
+        _instances.clear()
+        pool, _prefetch_pool = _prefetch_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+    for engine in engines:
+        engine.close()
+
+
+def synthesize_speech(text: str, voice: Literal["male", "female"] = "male", engines=None) -> AudioBuffer:
+    # First engine in TTS_ENGINES that succeeds; the last error if none does
+    errors = []
+    for name in engines or TTS_ENGINES:
+        try:
+            buf = get_engine(name).synthesize(text, voice)
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+            continue
+        if buf.frames:
+            return buf
+        errors.append(f"{name}: no audio")
+    raise TTSError("All TTS engines failed: " + "; ".join(errors))
+
+
 def generate_speech(
     text: str,
     out_path: str,
     voice: Literal["male", "female"] = "male",
 ):
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    return synthesize_speech(text, voice=voice).write(out_path)
+
+
+# ===================== LINE-LEVEL SYNTHESIS =====================
+# Songs repeat lines (the chorus comes back two or three times): every
+# distinct line is synthesized once, cached by (text, voice), and the song
+# is assembled on the audio side with silent gaps.
+def _synthesize_line(text: str, voice: str):
+    key = cache_key("tts_line", text, voice, ",".join(TTS_ENGINES))
+    buf = render_cache.load_audio("tts_line", key)
+    if buf is not None:
+        return buf.to_mono(), True
+
+    buf = synthesize_speech(text, voice=voice).to_mono()
+    render_cache.store_audio("tts_line", key, buf)
+    # Hand back the stored 16-bit copy, so a line is bit-identical (and
+    # hashes the same downstream) whether or not it came from the cache
+    stored = render_cache.load_audio("tts_line", key)
+    return (buf if stored is None else stored.to_mono()), False
+
+
+def _at_rate(buf: AudioBuffer, sample_rate: int) -> np.ndarray:
+    if buf.sample_rate == sample_rate:
+        return buf.samples
+    from app.audio.mixer import BLOCK_SIZE, _resampled_blocks
+
+    return np.concatenate([b[:, 0] for b in _resampled_blocks(buf, sample_rate, BLOCK_SIZE)])
+
+
+def _line_workers(count: int) -> int:
+    return max(1, min(count, get_engine(TTS_ENGINES[0]).max_concurrency if TTS_ENGINES else 1))
+
+
+def prefetch_lines(lines, voice: str = "male") -> dict:
+    # Starts synthesizing lines in the background, e.g. the first verse while
+    # the model is still writing the rest. Returns {line: Future}; hand them
+    # to synthesize_lines(prefetched=...) so no line is synthesized twice.
+    global _prefetch_pool
+    workers = _line_workers(64)  # before taking the lock: get_engine takes it too
+    with _instances_lock:
+        if _prefetch_pool is None:
+            _prefetch_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-prefetch")
+        pool = _prefetch_pool
+    return {line: pool.submit(_synthesize_line, line, voice) for line in dict.fromkeys(lines)}
 
-    # Try high-quality Edge TTS first (if installed + internet).
-    # Produces WAV directly (no ffmpeg needed) and usually sounds much less robotic.
-    try:
-        cmd = [
-            sys.executable,
-            "-m",
-            "edge_tts",
-            "--voice",
-            _edge_tts_voice(voice),
-            "--text",
-            text,
-            "--write-media",
-            out_path,
-            "--format",
-            "riff-24khz-16bit-mono-pcm",
-        ]
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
-        return out_path
-    except Exception:
-        # Fall back to offline Windows voice (pyttsx3)
-        pass
 
-    engine = pyttsx3.init()
+def synthesize_lines(sections, voice: str = "male", line_gap: float = LINE_GAP_SECONDS,
+                     section_gap: float = SECTION_GAP_SECONDS, stats: dict = None, prefetched: dict = None):
+    # sections: [(name, [line, ...]), ...] in sung order. Distinct lines run
+    # in parallel up to the first engine's concurrency limit; lines already
+    # started by prefetch_lines (same voice) are collected from their futures.
+    # Returns (AudioBuffer, timing), timing = [{"section", "text", "start", "end"}]
+    # in seconds on the speech track. stats, if given, receives line counts.
+    unique = list(dict.fromkeys(line for _, lines in sections for line in lines))
+    if not unique:
+        raise TTSError("No lyrics lines to synthesize")
 
-    # Tune voice slightly by gender
-    if voice == "female":
-        engine.setProperty("rate", 95)     # slower = less metallic
-        engine.setProperty("volume", 0.9)
-    else:
-        engine.setProperty("rate", 110)
-        engine.setProperty("volume", 1.0)
+    prefetched = prefetched or {}
+    todo = [line for line in unique if line not in prefetched]
+    results = {}
+    if todo:
+        with ThreadPoolExecutor(max_workers=_line_workers(len(todo))) as pool:
+            results.update(zip(todo, pool.map(lambda line: _synthesize_line(line, voice), todo)))
+    for line in unique:
+        if line in prefetched:
+            results[line] = prefetched[line].result()
 
-    voice_id = _choose_voice(engine, voice)
-    if voice_id:
-        engine.setProperty("voice", voice_id)
+    # Engines can differ in rate (fallbacks): assemble at the highest one
+    sr = max(buf.sample_rate for buf, _ in results.values())
+    audio = {line: _at_rate(buf, sr) for line, (buf, _) in results.items()}
 
-    engine.save_to_file(text, out_path)
-    engine.runAndWait()
+    pieces, timing = [], []
+    cursor = 0
+    for s, (name, lines) in enumerate(sections):
+        for i, line in enumerate(lines):
+            if pieces:
+                gap = int((line_gap if i else section_gap) * sr)
+                pieces.append(np.zeros(gap, dtype=np.float32))
+                cursor += gap
+            samples = audio[line]
+            pieces.append(samples)
+            timing.append({
+                "section": name,
+                "text": line,
+                "start": round(cursor / sr, 3),
+                "end": round((cursor + len(samples)) / sr, 3),
+            })
+            cursor += len(samples)
 
-    return out_path
+    if stats is not None:
+        stats.update({
+            "lines": len(timing),
+            "unique": len(unique),
+            "cached": sum(hit for _, hit in results.values()),
+        })
+    return AudioBuffer(np.concatenate(pieces).astype(np.float32, copy=False), sr), timing
@@ -1,87 +1,242 @@
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-import soundfile as sf
 import pyworld as pw
-import pretty_midi
-import librosa
 from scipy.signal import medfilt
 
+from app.audio.buffer import AudioBuffer, as_buffer
+from app.music.score import Score
+from app.pipeline.cache import render_cache
+
+
+# ===================== TIERS =====================
+# WORLD analysis settings per speed tier:
+#   fast:    DIO F0 (no Harvest), 20 ms frames → ~4x fewer frames to analyse
+#   quality: Harvest F0, 10 ms frames (the original settings)
+# Both time-scale by resampling the WORLD parameter frames instead of running
+# a separate STFT phase vocoder over the audio first.
+TIERS = {
+    "fast": {"f0": "dio", "frame_period": 20.0},
+    "quality": {"f0": "harvest", "frame_period": 10.0},
+}
+
+STRETCH_RATE = 0.88         # 🔥 Slow down for smoother singing
+MIDI_PITCH_BLEND = 0.50     # 🔥 Blend pitch (male voice friendly)
+SMOOTHING_MS = 70           # median filter span on the final F0 (no shaking)
+MIN_F0 = 60
+
+# Analysis runs on overlapping chunks spread over a process pool; the padding
+# gives every chunk's edge frames the context they would have in one pass
+CHUNK_SECONDS = float(os.getenv("SINGING_CHUNK_SECONDS", "8"))
+CHUNK_PAD_SECONDS = 0.3
+# Every job-queue worker process (MUSIC_WORKERS, same default as
+# app.pipeline.jobs) gets its own pool, so each takes its share of the cores
+# rather than all of them; a share of one core analyses inline, no pool
+_JOB_WORKERS = max(1, int(os.getenv("MUSIC_WORKERS", "2")))
+SINGING_WORKERS = int(os.getenv("SINGING_WORKERS", str(max(1, (os.cpu_count() or 1) // _JOB_WORKERS))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=SINGING_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            # Inside a job-queue worker nothing else calls shutdown(), and a
+            # multiprocessing child joins its non-daemon children (this pool's
+            # workers) before any atexit hook runs, so it would hang on exit.
+            # Finalizers with an exit priority run just before that join; this
+            # one outranks the pool's own queue finalizers (priority 10), which
+            # would otherwise close the queue before the stop signal is sent.
+            multiprocessing.util.Finalize(None, shutdown, kwargs={"wait": True}, exitpriority=100)
+        return _pool
+
+
+def shutdown(wait: bool = False):
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def midi_to_f0_curve(midi, frame_times):
+    # midi: path, PrettyMIDI or a prebuilt Score (avoids re-parsing the file)
+    return Score.from_midi(midi).f0_curve(frame_times)
+
+
+# ===================== ANALYSIS =====================
+def _analyze(audio: np.ndarray, sr: int, f0_method: str, frame_period: float):
+    # WORLD parameters (f0, spectral envelope, aperiodicity) of one segment
+    estimate = pw.dio if f0_method == "dio" else pw.harvest
+    f0, time_axis = estimate(audio, sr, frame_period=frame_period)
+    f0 = pw.stonemask(audio, f0, time_axis, sr)
 
-FFT_SIZE = 2048  # 🔥 MUST be same for cheaptrick & d4c
-
-
-def midi_to_f0_curve(midi_path, frame_times):
-    pm = pretty_midi.PrettyMIDI(midi_path)
-    midi_f0 = np.zeros(len(frame_times))
-
-    for instrument in pm.instruments:
-        if instrument.is_drum:
-            continue
-
-        for note in instrument.notes:
-            freq = pretty_midi.note_number_to_hz(note.pitch)
-            idx = np.where(
-                (frame_times >= note.start) &
-                (frame_times <= note.end)
-            )[0]
-            midi_f0[idx] = freq
-
-    return midi_f0
-
+    fft_size = pw.get_cheaptrick_fft_size(sr)
+    sp = pw.cheaptrick(audio, f0, time_axis, sr, fft_size=fft_size)
+    ap = pw.d4c(audio, f0, time_axis, sr, fft_size=fft_size)  # 🔥 SAME fft_size
+    return f0, sp, ap
+
+
+def _frame_count(samples: int, sr: int, frame_period: float) -> int:
+    # Same count pw.dio / pw.harvest produce
+    return int(samples / sr * 1000.0 / frame_period) + 1
+
+
+def analyze(audio: np.ndarray, sr: int, tier: str = "fast", workers: int = None):
+    # Chunked analysis: frames [k0, k1) of the whole clip come from a segment
+    # padded by CHUNK_PAD_SECONDS on both sides, cut on frame boundaries so
+    # the pieces concatenate into the same frame grid as a single pass.
+    # The values are close to a single pass, not equal to it: WORLD mixes a
+    # tiny safeguard noise into every call, so each chunk sees different noise
+    # samples. On a 20 s synthetic vocal: DIO F0 identical, Harvest F0 within
+    # 0.3 Hz on a few frames, envelope within 0.05 dB, aperiodicity within
+    # 0.03 (spread over all voiced frames, not just the seams).
+    cfg = TIERS[tier]
+    fp = cfg["frame_period"]
+    workers = SINGING_WORKERS if workers is None else workers
+
+    total = _frame_count(len(audio), sr, fp)
+    per_chunk = max(1, int(CHUNK_SECONDS * 1000.0 / fp))
+    pad = int(np.ceil(CHUNK_PAD_SECONDS * 1000.0 / fp))
+
+    if workers <= 1 or total <= per_chunk:
+        return _analyze(audio, sr, cfg["f0"], fp)
+
+    jobs = []
+    for k0 in range(0, total, per_chunk):
+        k1 = min(k0 + per_chunk, total)
+        seg_frame = max(k0 - pad, 0)
+        start = int(round(seg_frame * fp / 1000.0 * sr))
+        end = min(len(audio), int(round((k1 + pad) * fp / 1000.0 * sr)))
+        jobs.append((k0 - seg_frame, k1 - k0, start, end))
+
+    pool = _get_pool()
+    futures = [
+        pool.submit(_analyze, np.ascontiguousarray(audio[start:end]), sr, cfg["f0"], fp)
+        for _, _, start, end in jobs
+    ]
+
+    f0s, sps, aps = [], [], []
+    for (offset, count, _, _), future in zip(jobs, futures):
+        f0, sp, ap = future.result()
+        f0, sp, ap = f0[offset:offset + count], sp[offset:offset + count], ap[offset:offset + count]
+        if len(f0) < count:
+            # Clip ended a frame early in this segment: hold the last frame
+            short = count - len(f0)
+            f0 = np.pad(f0, (0, short), mode="edge")
+            sp = np.pad(sp, ((0, short), (0, 0)), mode="edge")
+            ap = np.pad(ap, ((0, short), (0, 0)), mode="edge")
+        f0s.append(f0)
+        sps.append(sp)
+        aps.append(ap)
+
+    return np.concatenate(f0s), np.concatenate(sps), np.concatenate(aps)
+
+
+# ===================== ANALYSIS CACHE =====================
+# The analysis depends only on the speech, so it is kept in the render cache
+# (keyed by lyrics + voice + tier by the caller): a new genre or melody for
+# the same lyrics only redoes the F0 blend and pw.synthesize. Stored as
+# float16 log-envelope / aperiodicity, about 1/4 of the float64 arrays.
+def _encode(f0, sp, ap, sr: int) -> dict:
+    return {
+        "f0": f0,
+        "log_sp": np.log(sp).astype(np.float16),
+        "ap": ap.astype(np.float16),
+        "sample_rate": np.int64(sr),
+    }
+
+
+def _decode(arrays: dict):
+    f0 = np.ascontiguousarray(arrays["f0"], dtype=np.float64)
+    sp = np.exp(arrays["log_sp"].astype(np.float64))
+    ap = arrays["ap"].astype(np.float64)
+    return f0, sp, ap
+
+
+def cached_analysis(audio: np.ndarray, sr: int, tier: str = "fast", workers: int = None, cache_key: str = None):
+    if cache_key is None:
+        return analyze(audio, sr, tier, workers=workers)
+
+    arrays = render_cache.load_arrays("world", cache_key)
+    if arrays is None or int(arrays["sample_rate"]) != sr:
+        arrays = _encode(*analyze(audio, sr, tier, workers=workers), sr)
+        render_cache.store_arrays("world", cache_key, **arrays)
+
+    # Fresh analyses go through the same float16 round trip, so a song sounds
+    # the same whether or not its analysis came from the cache
+    return _decode(arrays)
+
+
+# ===================== TIME SCALING =====================
+def stretch_frames(f0, sp, ap, rate: float):
+    # Slower by 1/rate: read the frame grid at `rate` frames per output frame.
+    # Envelopes interpolate linearly; F0 takes the nearest frame so voiced /
+    # unvoiced decisions stay sharp.
+    n = len(f0)
+    m = max(1, int(round(n / rate)))
+    pos = np.minimum(np.arange(m) * rate, n - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, n - 1)
+    w = (pos - lo)[:, None]
+
+    f0_out = f0[np.rint(pos).astype(np.int64)]
+    sp_out = sp[lo] * (1 - w) + sp[hi] * w
+    ap_out = ap[lo] * (1 - w) + ap[hi] * w
+    return f0_out, np.ascontiguousarray(sp_out), np.ascontiguousarray(ap_out)
+
+
+# ===================== SINGING =====================
+def tts_to_singing(tts_wav, midi_file, output_wav=None, tier: str = "fast", workers: int = None,
+                   analysis_key: str = None):
+    # tts_wav: WAV path or AudioBuffer. Returns an AudioBuffer unless output_wav is given.
+    # analysis_key: cache key identifying this speech (see cached_analysis)
+    if tier not in TIERS:
+        raise ValueError(f"Unknown singing tier '{tier}', choose from {sorted(TIERS)}")
+    fp = TIERS[tier]["frame_period"]
 
-def tts_to_singing(tts_wav, midi_file, output_wav):
     # ---------------- LOAD AUDIO ----------------
-    audio, sr = sf.read(tts_wav)
-    if audio.ndim > 1:
-        audio = audio.mean(axis=1)
-
-    # 🔥 Slow down for smoother singing
-    audio = librosa.effects.time_stretch(audio, rate=0.88)
-
-    # ---------------- PITCH EXTRACTION ----------------
-    f0, time_axis = pw.harvest(
-        audio,
-        sr,
-        frame_period=10.0
-    )
-    f0 = pw.stonemask(audio, f0, time_axis, sr)
+    speech = as_buffer(tts_wav).to_mono()
+    audio, sr = np.ascontiguousarray(speech.samples, dtype=np.float64), speech.sample_rate
+
+    # ---------------- ANALYSIS + STRETCH ----------------
+    f0, sp, ap = cached_analysis(audio, sr, tier, workers=workers, cache_key=analysis_key)
+    f0, sp, ap = stretch_frames(f0, sp, ap, STRETCH_RATE)
+    time_axis = np.arange(len(f0)) * fp / 1000.0
 
     # ---------------- MIDI PITCH ----------------
     midi_f0 = midi_to_f0_curve(midi_file, time_axis)
 
-    # 🔥 Blend pitch (male voice friendly)
-    alpha = 0.50
     final_f0 = np.where(
-        midi_f0 > 0,
-        alpha * midi_f0 + (1 - alpha) * f0,
+        (midi_f0 > 0) & (f0 > 0),
+        MIDI_PITCH_BLEND * midi_f0 + (1 - MIDI_PITCH_BLEND) * f0,
         f0
     )
 
-    # 🔥 Strong smoothing (no shaking)
-    final_f0 = medfilt(final_f0, kernel_size=7)
-    final_f0[final_f0 < 60] = 0
+    # 🔥 Strong smoothing (no shaking), same span whatever the frame period
+    kernel = max(3, int(SMOOTHING_MS / fp) | 1)
+    final_f0 = medfilt(final_f0, kernel_size=kernel)
+    final_f0[final_f0 < MIN_F0] = 0
 
     # ---------------- WORLD RESYNTHESIS ----------------
-    sp = pw.cheaptrick(
-        audio,
-        final_f0,
-        time_axis,
-        sr,
-        fft_size=FFT_SIZE
-    )
+    singing = pw.synthesize(final_f0, sp, ap, sr, frame_period=fp)
 
-    ap = pw.d4c(
-        audio,
-        final_f0,
-        time_axis,
-        sr,
-        fft_size=FFT_SIZE   # 🔥 SAME fft_size
-    )
-
-    singing = pw.synthesize(
-        final_f0,
-        sp,
-        ap,
-        sr
-    )
+    # Prevent clipping
+    peak = float(np.max(np.abs(singing))) if singing.size else 0.0
+    if peak > 1.0:
+        singing = singing / peak * 0.98
 
-    sf.write(output_wav, singing, sr)
+    result = AudioBuffer(singing.astype(np.float32), sr)
+    if output_wav is None:
+        return result
+    return result.write(output_wav)
@@ -1,15 +1,92 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.music import MusicGeneration
+from app.models.user import User
 
 
-def create_music(db: Session, data: dict):
+# ===================== MUSIC =====================
+# Listing projection: everything but lyrics
+LIST_COLUMNS = (
+    MusicGeneration.id,
+    MusicGeneration.prompt,
+    MusicGeneration.emotion,
+    MusicGeneration.genre,
+    MusicGeneration.tempo,
+    MusicGeneration.scale,
+    MusicGeneration.wav_path,
+    MusicGeneration.duration,
+    MusicGeneration.created_at,
+)
+
+
+async def create_music(db: AsyncSession, data: dict):
     music = MusicGeneration(**data)
     db.add(music)
-    db.commit()
-    db.refresh(music)
+    await db.commit()
+    await db.refresh(music)
     return music
 
-def get_all_music(db: Session):
-    return db.query(MusicGeneration).order_by(MusicGeneration.created_at.desc()).all()
+
+async def bulk_create_music(db: AsyncSession, rows: list):
+    # One INSERT ... RETURNING for the whole list; ids come back in row order
+    if not rows:
+        return []
+    result = await db.execute(
+        insert(MusicGeneration).returning(MusicGeneration.id, sort_by_parameter_order=True),
+        rows,
+    )
+    ids = list(result.scalars())
+    await db.commit()
+    return ids
+
+
+async def get_music(db: AsyncSession, music_id: int):
+    return await db.get(MusicGeneration, music_id)
+
+
+async def list_music_page(db: AsyncSession, limit: int, after=None, emotion: str = None, genre: str = None, user_id: int = None):
+    # Completed songs newest first; after = (created_at, id) of the previous page's last row
+    query = select(*LIST_COLUMNS).where(MusicGeneration.status == "completed")
+
+    if emotion:
+        query = query.where(MusicGeneration.emotion == emotion)
+    if genre:
+        query = query.where(MusicGeneration.genre == genre)
+    if user_id is not None:
+        query = query.where(MusicGeneration.user_id == user_id)
+    if after is not None:
+        # Compare against the anchor row's stored created_at rather than the
+        # cursor's copy: SQLite keeps func.now() at whole seconds and a bound
+        # datetime would not compare equal to it. The cursor's timestamp is
+        # only the fallback for an anchor row that has since been deleted.
+        created_at, music_id = after
+        anchor = select(MusicGeneration.created_at).where(MusicGeneration.id == music_id).scalar_subquery()
+        query = query.where(
+            tuple_(MusicGeneration.created_at, MusicGeneration.id) < tuple_(func.coalesce(anchor, created_at), music_id)
+        )
+
+    query = query.order_by(MusicGeneration.created_at.desc(), MusicGeneration.id.desc()).limit(limit)
+    return (await db.execute(query)).all()
+
+
+async def delete_music(db: AsyncSession, music: MusicGeneration):
+    await db.delete(music)
+    await db.commit()
+
+
+# ===================== USERS =====================
+async def get_user_by_email(db: AsyncSession, email: str):
+    return (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+
+
+async def create_user(db: AsyncSession, data: dict):
+    user = User(**data)
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
 
 
+async def update_password_hash(db: AsyncSession, user_id: int, password_hash: str):
+    await db.execute(update(User).where(User.id == user_id).values(password_hash=password_hash))
+    await db.commit()
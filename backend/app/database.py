@@ -1,13 +1,197 @@
+import contextvars
+import logging
+import logging.handlers
 import os
-from sqlalchemy import create_engine
+import queue
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 from dotenv import load_dotenv
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+# SQLite fallback keeps tests and local runs working without Postgres
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./text_to_music.db")
+
+# Size the pool for MUSIC_WORKERS processes + the API threads
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# Global SQL echo (every statement); per-request echo uses the X-SQL-Echo header
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+
+
+# ===================== POOL METRICS =====================
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(1000 * self.total_wait / max(self.checkouts, 1), 3),
+                "max_wait_ms": round(1000 * self.max_wait, 3),
+            }
+
+
+def _timed_pool(base, stats: PoolStats):
+    # Pool subclass measuring how long callers wait for a free connection
+    class TimedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except Exception:
+                stats.record(time.perf_counter() - start, timed_out=True)
+                raise
+            stats.record(time.perf_counter() - start)
+            return conn
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+def _pool_metrics(pool, stats: PoolStats) -> dict:
+    metrics = {"pool": type(pool).__name__, **stats.snapshot()}
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": DB_MAX_OVERFLOW,
+        })
+    return metrics
+
+
+def pool_metrics() -> dict:
+    # "sync": pipeline workers / background jobs, "async": the API routes
+    return {
+        "sync": _pool_metrics(engine.pool, sync_pool_stats),
+        "async": _pool_metrics(async_engine.pool, async_pool_stats),
+    }
+
+
+# ===================== ENGINES =====================
+# The API routes use the async engine; process-pool workers, the lyrics cache
+# and batch jobs keep the plain sync engine.
+def _async_url(url: str) -> str:
+    u = make_url(url)
+    driver = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}.get(u.get_backend_name())
+    return u.set(drivername=driver).render_as_string(hide_password=False) if driver else url
 
-engine = create_engine(DATABASE_URL, echo=True)
+
+def _engine_args(url: str, pool_class, stats: PoolStats) -> dict:
+    if url.startswith("sqlite"):
+        args = {"connect_args": {"check_same_thread": False}}
+        if make_url(url).database in (None, "", ":memory:"):
+            # One shared connection, otherwise each checkout sees an empty DB.
+            # The sync and async engines still get separate in-memory DBs, so
+            # use a file when jobs and routes must see the same rows.
+            args["poolclass"] = StaticPool
+        else:
+            args.update(poolclass=_timed_pool(pool_class, stats), pool_size=DB_POOL_SIZE,
+                        max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        return args
+
+    args = {
+        "poolclass": _timed_pool(pool_class, stats),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    if url.startswith("postgresql") and DB_STATEMENT_TIMEOUT_MS > 0:
+        if "+asyncpg" in url:
+            args["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            args["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return args
+
+
+engine = create_engine(DATABASE_URL, echo=DB_ECHO, **_engine_args(DATABASE_URL, QueuePool, sync_pool_stats))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, echo=DB_ECHO,
+    **_engine_args(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, async_pool_stats),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ===================== PER-REQUEST SQL ECHO =====================
+# Set by the HTTP middleware in main.py. Statements are handed to a queue and
+# written by a background thread, so logging never blocks the query itself.
+sql_echo = contextvars.ContextVar("sql_echo", default=False)
+
+sql_logger = logging.getLogger("app.sql")
+sql_logger.propagate = False
+_sql_queue = queue.SimpleQueue()
+_sql_listener = None
+_sql_listener_lock = threading.Lock()
+
+
+def _ensure_sql_listener():
+    global _sql_listener
+    with _sql_listener_lock:
+        if _sql_listener is None:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s SQL %(message)s"))
+            sql_logger.addHandler(logging.handlers.QueueHandler(_sql_queue))
+            sql_logger.setLevel(logging.INFO)
+            _sql_listener = logging.handlers.QueueListener(_sql_queue, handler)
+            _sql_listener.start()
+
+
+def _echo_statement(conn, cursor, statement, parameters, context, executemany):
+    if sql_echo.get() and not DB_ECHO:
+        _ensure_sql_listener()
+        sql_logger.info("%s %r", statement, parameters)
+
+
+event.listen(engine, "before_cursor_execute", _echo_statement)
+event.listen(async_engine.sync_engine, "before_cursor_execute", _echo_statement)
@@ -0,0 +1,5 @@
+-- Existing databases: create_all() does not alter tables that already exist.
+-- Adds the job-progress columns written by the background job queue.
+ALTER TABLE text_to_music ADD COLUMN IF NOT EXISTS stage VARCHAR;
+ALTER TABLE text_to_music ADD COLUMN IF NOT EXISTS progress DOUBLE PRECISION;
+ALTER TABLE text_to_music ADD COLUMN IF NOT EXISTS error TEXT;
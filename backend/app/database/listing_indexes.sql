@@ -0,0 +1,8 @@
+-- Existing databases: create_all() does not alter tables that already exist.
+-- Adds the owner column and the keyset-pagination indexes used by GET /music/.
+ALTER TABLE text_to_music ADD COLUMN IF NOT EXISTS user_id INTEGER;
+
+CREATE INDEX IF NOT EXISTS ix_text_to_music_status_created ON text_to_music (status, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_text_to_music_emotion_created ON text_to_music (emotion, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_text_to_music_genre_created ON text_to_music (genre, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_text_to_music_user_created ON text_to_music (user_id, created_at, id);
@@ -0,0 +1,2 @@
+-- Existing databases: login and registration rely on a unique index on email.
+CREATE UNIQUE INDEX IF NOT EXISTS ix_user_email ON "user" (email);
@@ -0,0 +1,69 @@
+import argparse
+
+from sqlalchemy import func
+
+from app.database import Base, SessionLocal, engine
+from app.lyrics.cache import FALLBACK_PROMPT, lyrics_store
+from app.lyrics.client import LyricsClientError
+from app.lyrics.generator import generate_lyrics
+from app.models.music import MusicGeneration
+from app.nlp.pipeline import emotion_map
+
+
+# ===================== LYRIC BANK =====================
+# Offline batch job: pre-generates lyrics for the most requested prompts and
+# one generic song per emotion (used as the fallback when the LLM is down).
+#   python -m app.lyrics.bank --top 100
+BANK_DURATION = 60.0
+
+
+def frequent_prompts(limit: int):
+    # [(prompt, emotion)] most generated first, grouped on the normalized prompt
+    db = SessionLocal()
+    try:
+        norm = func.lower(func.trim(MusicGeneration.prompt))
+        rows = (
+            db.query(norm, MusicGeneration.emotion, func.count(MusicGeneration.id).label("n"))
+            .filter(MusicGeneration.prompt.isnot(None), MusicGeneration.emotion.isnot(None))
+            .group_by(norm, MusicGeneration.emotion)
+            .order_by(func.count(MusicGeneration.id).desc())
+            .limit(limit)
+            .all()
+        )
+        return [(prompt, emotion) for prompt, emotion, _ in rows]
+    finally:
+        db.close()
+
+
+def build_bank(top: int = 100, refresh: bool = False):
+    jobs = [(prompt, emotion, prompt) for prompt, emotion in frequent_prompts(top)]
+    for emotion in list(emotion_map) + ["neutral"]:
+        jobs.append((FALLBACK_PROMPT, emotion, f"a song that feels {emotion}"))
+
+    done = skipped = failed = 0
+    for key_prompt, emotion, idea in jobs:
+        if not refresh and lyrics_store.get(key_prompt, emotion) is not None:
+            skipped += 1
+            continue
+        try:
+            text = generate_lyrics(idea, emotion, BANK_DURATION)
+        except LyricsClientError as e:
+            print(f"❌ {emotion!r} / {idea!r}: {e}")
+            failed += 1
+            continue
+        lyrics_store.put(key_prompt, emotion, text, source="bank")
+        done += 1
+        print(f"✅ {emotion!r} / {idea!r}")
+
+    print(f"Lyric bank: {done} generated, {skipped} already cached, {failed} failed")
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate the lyrics bank")
+    parser.add_argument("--top", type=int, default=100, help="most frequent prompts to cover")
+    parser.add_argument("--refresh", action="store_true", help="regenerate entries that already exist")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    build_bank(args.top, args.refresh)
@@ -0,0 +1,157 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from app.database import SessionLocal
+from app.lyrics.client import LyricsClientError
+from app.lyrics.generator import generate_lyrics, lyrics_minutes
+from app.models.lyrics import LyricsCache
+from app.pipeline.cache import cache_key, normalize_prompt
+
+
+LYRICS_TTL = timedelta(days=float(os.getenv("LYRICS_CACHE_TTL_DAYS", "30")))
+LYRICS_MAX_ROWS = int(os.getenv("LYRICS_CACHE_MAX_ROWS", "5000"))
+# Hot entries kept in-process so repeats skip the database round trip too
+MEMORY_ENTRIES = int(os.getenv("LYRICS_MEMORY_ENTRIES", "256"))
+
+# Bank entry used when the LLM is down and nothing is cached for the prompt
+FALLBACK_PROMPT = ""
+
+
+def lyrics_key(prompt: str, emotion: str, minutes: int = 1) -> str:
+    return cache_key("lyrics", normalize_prompt(prompt), emotion, minutes)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _expired(row: LyricsCache, now: datetime) -> bool:
+    # Bank entries are refreshed by the batch job, never aged out
+    if row.source == "bank" or row.last_used_at is None:
+        return False
+    used = row.last_used_at
+    if used.tzinfo is None:
+        used = used.replace(tzinfo=timezone.utc)
+    return now - used > LYRICS_TTL
+
+
+class LyricsStore:
+    def __init__(self, ttl: timedelta = LYRICS_TTL, max_rows: int = LYRICS_MAX_ROWS, memory_entries: int = MEMORY_ENTRIES):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ---------- in-process LRU ----------
+    def _remember(self, key: str, text: str):
+        with self._lock:
+            self._memory[key] = text
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _recall(self, key: str):
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+            return text
+
+    # ---------- database ----------
+    def get(self, prompt: str, emotion: str, minutes: int = 1):
+        key = lyrics_key(prompt, emotion, minutes)
+        text = self._recall(key)
+        if text is not None:
+            return text
+
+        db = SessionLocal()
+        try:
+            row = db.get(LyricsCache, key)
+            if row is None:
+                return None
+            now = _now()
+            if _expired(row, now):
+                db.delete(row)
+                db.commit()
+                return None
+            row.hits = (row.hits or 0) + 1
+            row.last_used_at = now
+            text = row.lyrics
+            db.commit()
+        finally:
+            db.close()
+
+        self._remember(key, text)
+        return text
+
+    def put(self, prompt: str, emotion: str, text: str, source: str = "llm", minutes: int = 1):
+        key = lyrics_key(prompt, emotion, minutes)
+        now = _now()
+        db = SessionLocal()
+        try:
+            row = db.get(LyricsCache, key)
+            if row is None:
+                row = LyricsCache(key=key, hits=0, created_at=now)
+                db.add(row)
+            row.prompt = normalize_prompt(prompt)
+            row.emotion = emotion
+            row.lyrics = text
+            row.source = source
+            row.last_used_at = now
+            db.commit()
+        finally:
+            db.close()
+
+        self._remember(key, text)
+        self.evict()
+
+    def evict(self):
+        # Drop expired LLM entries, then the least recently used ones over max_rows
+        db = SessionLocal()
+        try:
+            generated = db.query(LyricsCache).filter(LyricsCache.source != "bank")
+            generated.filter(LyricsCache.last_used_at < _now() - self.ttl).delete(synchronize_session=False)
+
+            excess = generated.count() - self.max_rows
+            if excess > 0:
+                oldest = (
+                    generated.order_by(LyricsCache.last_used_at.asc())
+                    .limit(excess)
+                    .with_entities(LyricsCache.key)
+                    .all()
+                )
+                db.query(LyricsCache).filter(LyricsCache.key.in_([k for (k,) in oldest])).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def fallback(self, emotion: str):
+        return self.get(FALLBACK_PROMPT, emotion) or self.get(FALLBACK_PROMPT, "neutral")
+
+
+lyrics_store = LyricsStore()
+
+
+# ===================== LOOKUP =====================
+# Returns (lyrics, source): "cache" for a stored entry, "llm" for a fresh
+# generation, "fallback" for the emotion's bank entry when the LLM is down.
+# on_section: see generate_lyrics; only called when the LLM actually writes.
+def get_or_generate_lyrics(prompt: str, emotion: str, duration: float, on_section=None):
+    minutes = lyrics_minutes(duration)
+    text = lyrics_store.get(prompt, emotion, minutes)
+    if text is not None:
+        return text, "cache"
+
+    try:
+        text = generate_lyrics(prompt, emotion, duration, on_section=on_section)
+    except LyricsClientError:
+        text = lyrics_store.fallback(emotion)
+        if text is None:
+            raise
+        return text, "fallback"
+
+    lyrics_store.put(prompt, emotion, text, minutes=minutes)
+    return text, "llm"
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "phi")
+
+CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3"))
+# Max silence between bytes; a stalled model fails instead of hanging the worker
+READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "120"))
+MAX_RETRIES = int(os.getenv("OLLAMA_RETRIES", "2"))
+BACKOFF_SECONDS = float(os.getenv("OLLAMA_BACKOFF", "0.5"))
+# Requests in flight per model (Ollama serializes generation per model anyway)
+MAX_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "2"))
+
+
+class LyricsClientError(RuntimeError):
+    pass
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+
+class OllamaClient:
+    def __init__(
+        self,
+        url: str = OLLAMA_URL,
+        model: str = OLLAMA_MODEL,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        retries: int = MAX_RETRIES,
+        backoff: float = BACKOFF_SECONDS,
+        concurrency: int = MAX_CONCURRENCY,
+    ):
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.concurrency = concurrency
+
+        # Keep-alive connections shared by every request in this process
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(concurrency * 2, 4))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._limits = {}
+        self._limits_lock = threading.Lock()
+
+    def _limit(self, model: str) -> threading.BoundedSemaphore:
+        with self._limits_lock:
+            if model not in self._limits:
+                self._limits[model] = threading.BoundedSemaphore(self.concurrency)
+            return self._limits[model]
+
+    def _post(self, payload: dict, stream: bool) -> requests.Response:
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout, stream=stream)
+                response.raise_for_status()
+                return response
+            except requests.RequestException as e:
+                if attempt >= self.retries or not _retryable(e):
+                    raise LyricsClientError(f"Ollama request failed: {e}") from e
+                time.sleep(self.backoff * (2 ** attempt))
+                attempt += 1
+
+    def generate(self, prompt: str, model: str = None) -> str:
+        model = model or self.model
+        with self._limit(model):
+            response = self._post({"model": model, "prompt": prompt, "stream": False}, stream=False)
+            try:
+                return response.json()["response"]
+            except (KeyError, TypeError, ValueError) as e:
+                # Not JSON, or JSON without the text: same as a failed request
+                raise LyricsClientError(f"Malformed Ollama reply: {e!r}") from e
+
+    def stream(self, prompt: str, model: str = None):
+        # Yields text fragments as the model produces them (Ollama NDJSON).
+        # Retries only happen before the first fragment arrives.
+        model = model or self.model
+        with self._limit(model):
+            response = self._post({"model": model, "prompt": prompt, "stream": True}, stream=True)
+            try:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise LyricsClientError(f"Ollama error: {chunk['error']}")
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+            except requests.RequestException as e:
+                raise LyricsClientError(f"Ollama stream interrupted: {e}") from e
+            except (AttributeError, ValueError) as e:
+                raise LyricsClientError(f"Malformed Ollama stream chunk: {e!r}") from e
+            finally:
+                response.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OllamaClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
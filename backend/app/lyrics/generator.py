@@ -1,12 +1,18 @@
-import requests
+import re
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+from app.lyrics.client import LyricsClientError, get_client
 
-def generate_lyrics(prompt: str, emotion: str, duration: float):
-    # minutes = max(1, int(duration // 60))
-    minutes = 1
+SECTION_HEADER = re.compile(r"^\W*(verse|chorus|bridge|pre-chorus|intro|outro|hook)\b", re.IGNORECASE)
 
 
+def lyrics_minutes(duration: float) -> int:
+    # Length asked of the model; also part of the lyrics cache key
+    return max(1, int(round((duration or 0) / 60)))
+
+
+def build_lyrics_prompt(prompt: str, emotion: str, duration: float) -> str:
+    minutes = lyrics_minutes(duration)
+
     full_prompt = f"""
 Write song lyrics.
 
@@ -26,13 +32,54 @@ Song idea:
 {prompt}
 """
 
-    payload = {
-        "model": "phi",
-        "prompt": full_prompt,
-        "stream": False
-    }
+    return full_prompt
+
+
+def generate_lyrics(prompt: str, emotion: str, duration: float, on_section=None):
+    # on_section(text), if given, receives each section as soon as the model
+    # has written it (streamed); the full lyrics are still returned at the end
+    if on_section is None:
+        text = get_client().generate(build_lyrics_prompt(prompt, emotion, duration)).strip()
+    else:
+        sections = []
+        for section in stream_lyrics(prompt, emotion, duration):
+            sections.append(section)
+            on_section(section)
+        text = "\n\n".join(sections).strip()
+
+    # An empty reply is a failed one: the caller falls back instead of caching it
+    if not text:
+        raise LyricsClientError("Ollama returned no lyrics")
+    return text
+
+
+# ===================== STREAMING =====================
+# Yields each section (verse / chorus / ...) as soon as the model has
+# finished writing it, so TTS can start on the first verse while the rest
+# of the song is still being generated. A section ends at a blank line or
+# when the next section header starts.
+def stream_lyrics(prompt: str, emotion: str, duration: float):
+    section = []
+    pending = ""
+
+    def _flush():
+        text = "\n".join(section).strip()
+        section.clear()
+        return text
 
-    response = requests.post(OLLAMA_URL, json=payload)
-    response.raise_for_status()
+    for fragment in get_client().stream(build_lyrics_prompt(prompt, emotion, duration)):
+        pending += fragment
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if not line.strip() or (SECTION_HEADER.match(line) and section):
+                text = _flush()
+                if text:
+                    yield text
+            if line.strip():
+                section.append(line.rstrip())
 
-    return response.json()["response"].strip()
+    if pending.strip():
+        section.append(pending.rstrip())
+    text = _flush()
+    if text:
+        yield text
@@ -0,0 +1,90 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ===================== OLLAMA STUB =====================
+# Minimal stand-in for Ollama's /api/generate so the lyrics client and the
+# pipeline can run without a model:
+#   python -m app.lyrics.stub_server --port 11434
+# or in-process:  server, url = start_stub_server()
+STUB_LYRICS = """Verse 1:
+Walking through the {idea}
+Every step a little lighter now
+
+Chorus:
+Sing it loud, sing it slow
+Let the feeling come and go
+
+Verse 2:
+Morning light on the {idea}
+Holding on to what we found
+
+Chorus:
+Sing it loud, sing it slow
+Let the feeling come and go
+"""
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Seconds between streamed fragments, to mimic token generation
+    token_delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        idea = payload.get("prompt", "").strip().splitlines()[-1:] or ["night"]
+        text = STUB_LYRICS.format(idea=idea[0][:40] or "night")
+        model = payload.get("model", "stub")
+
+        if not payload.get("stream", True):
+            body = json.dumps({"model": model, "response": text, "done": True}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        # Word-sized fragments, like a real tokenizer (roughly)
+        for word in text.split(" "):
+            chunk = {"model": model, "response": word + " ", "done": False}
+            self.wfile.write(json.dumps(chunk).encode() + b"\n")
+            self.wfile.flush()
+            if self.token_delay:
+                time.sleep(self.token_delay)
+        self.wfile.write(json.dumps({"model": model, "response": "", "done": True}).encode() + b"\n")
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, token_delay: float = 0.0):
+    # Runs in a daemon thread; returns (server, generate_url)
+    handler = type("Handler", (StubHandler,), {"token_delay": token_delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api/generate"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Ollama stub for lyrics generation")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    handler = type("Handler", (StubHandler,), {"token_delay": args.token_delay})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Ollama stub listening on http://{args.host}:{args.port}/api/generate")
+    server.serve_forever()
@@ -1,10 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from app.routes.music import router as music_router
 from app.routes.auth import router as auth_router
-from app.database import Base, engine
-import nltk
+from app.database import Base, engine, pool_metrics, sql_echo
+from app.pipeline.jobs import job_queue
+from app import passwords
+from app.audio import singing, tts
 
 # Load environment variables
 load_dotenv()
@@ -12,18 +14,13 @@ load_dotenv()
 app = FastAPI(title="Text-to-Music AI System")
 
 
-# Download NLTK data on startup
-@app.on_event("startup")
-def setup_nltk():
-    try:
-        nltk.data.find("tokenizers/punkt")
-    except LookupError:
-        nltk.download("punkt")
-
-    try:
-        nltk.data.find("corpora/stopwords")
-    except LookupError:
-        nltk.download("stopwords")
+# Stop generation and password-hashing workers with the server
+@app.on_event("shutdown")
+def stop_job_queue():
+    job_queue.shutdown(wait=False)
+    passwords.shutdown()
+    singing.shutdown()
+    tts.shutdown()
 
 
 # ✅ CORS (Frontend access)
@@ -33,8 +30,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# 🔍 Per-request SQL logging: send "X-SQL-Echo: 1"
+@app.middleware("http")
+async def sql_echo_header(request: Request, call_next):
+    token = sql_echo.set(request.headers.get("x-sql-echo") == "1")
+    try:
+        return await call_next(request)
+    finally:
+        sql_echo.reset(token)
+
+
 # ✅ ROUTES
 app.include_router(auth_router)
 app.include_router(music_router)
@@ -45,5 +53,10 @@ def root():
     return {"message": "Text-to-Music Backend Running"}
 
 
+@app.get("/metrics/db")
+def db_metrics():
+    return pool_metrics()
+
+
 # Create DB tables (music + user models)
 Base.metadata.create_all(bind=engine)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class LyricsCache(Base):
+    __tablename__ = "lyrics_cache"
+
+    # sha256 of (normalized prompt, emotion); see app.lyrics.cache.lyrics_key
+    key = Column(String(64), primary_key=True)
+
+    prompt = Column(Text)
+    emotion = Column(String, index=True)
+    lyrics = Column(Text, nullable=False)
+
+    # llm → generated on demand (expires), bank → pre-generated by app.lyrics.bank
+    source = Column(String, default="llm")
+    hits = Column(Integer, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
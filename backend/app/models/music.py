@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -7,6 +7,7 @@ class MusicGeneration(Base):
     __tablename__ = "text_to_music"
 
     id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=True)
 
     prompt = Column(Text)
     emotion = Column(String)
@@ -20,5 +21,18 @@ class MusicGeneration(Base):
     duration = Column(Float)
     lyrics = Column(Text)
 
+    # queued → running → completed | failed
     status = Column(String, default="completed")
+    stage = Column(String, nullable=True)
+    progress = Column(Float, nullable=True)
+    error = Column(Text, nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Keyset pagination on (created_at, id), optionally narrowed by one filter
+    __table_args__ = (
+        Index("ix_text_to_music_status_created", "status", "created_at", "id"),
+        Index("ix_text_to_music_emotion_created", "emotion", "created_at", "id"),
+        Index("ix_text_to_music_genre_created", "genre", "created_at", "id"),
+        Index("ix_text_to_music_user_created", "user_id", "created_at", "id"),
+    )
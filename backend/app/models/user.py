@@ -6,7 +6,7 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(100), nullable=False)  # ✅ matches DB
-    email = Column(String(150), unique=True, nullable=False)
+    email = Column(String(150), unique=True, index=True, nullable=False)
     password_hash = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -1,7 +1,11 @@
-import pretty_midi
-import random
+import hashlib
 import os
 import time
+import uuid
+
+import numpy as np
+
+from app.music.score import NOTE_DTYPE, Score
 
 
 # ===================== EMOTION → CHORDS =====================
@@ -13,6 +17,11 @@ CHORD_PROGRESSIONS = {
     "neutral": [[60, 64, 67]]
 }
 
+SCALES = {
+    "major": np.array([60, 62, 64, 65, 67, 69, 71], dtype=np.int16),
+    "minor": np.array([60, 62, 63, 65, 67, 68, 70], dtype=np.int16),
+}
+
 
 # ===================== GENRE → MUSIC STYLE =====================
 GENRE_SETTINGS = {
@@ -39,78 +48,107 @@ GENRE_SETTINGS = {
     }
 }
 
+# Song length in seconds (the melody fills it after the intro chords)
+DEFAULT_DURATION = 60
+MIN_DURATION = 10
+MAX_DURATION = float(os.getenv("SONG_MAX_SECONDS", "600"))
 
-# ===================== MAIN GENERATOR =====================
-def generate_music(features, prompt: str, genre: str = "lofi"):
-    os.makedirs("generated_music", exist_ok=True)
+# The melody is sampled one fixed window at a time, so work per window is
+# constant and a long song costs proportionally more, never worse
+MELODY_BLOCK_SECONDS = 30
+CHORD_VELOCITY = 70
+
+
+def new_midi_path() -> str:
+    # Suffix keeps songs composed in the same millisecond (batches) apart
+    filename = f"music_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}.mid"
+    return os.path.join("generated_music", filename)
 
-    # Same prompt → same style
-    random.seed(prompt.lower().strip())
+
+def prompt_rng(prompt: str) -> np.random.Generator:
+    # Same prompt → same style. Own generator per request, so concurrent
+    # songs never share (or reseed) random state.
+    digest = hashlib.sha256(prompt.lower().strip().encode("utf-8")).digest()
+    return np.random.default_rng(int.from_bytes(digest[:8], "little"))
+
+
+# ===================== MAIN GENERATOR =====================
+# Every note is sampled up front as whole arrays: no per-note Python objects.
+def compose_score(features, prompt: str, genre: str = "lofi", duration: float = DEFAULT_DURATION) -> Score:
+    rng = prompt_rng(prompt)
 
     # Validate genre
     genre_cfg = GENRE_SETTINGS.get(genre, GENRE_SETTINGS["lofi"])
 
     # Tempo priority: genre > NLP
-    tempo = random.randint(*genre_cfg["tempo"])
-
-    midi = pretty_midi.PrettyMIDI(initial_tempo=tempo)
-    instrument = pretty_midi.Instrument(program=genre_cfg["instrument"])
+    lo, hi = genre_cfg["tempo"]
+    tempo = int(rng.integers(lo, hi + 1))
+    beat = 60 / tempo
 
-    # Emotion-based harmony
+    # ===================== INTRO (CHORDS) =====================
+    # Emotion-based harmony, in a per-song order (the shared table is never shuffled)
     emotion = features.get("emotion", "neutral")
     chords = CHORD_PROGRESSIONS.get(emotion, CHORD_PROGRESSIONS["neutral"])
-    random.shuffle(chords)
+    chords = np.array(chords, dtype=np.int16)[rng.permutation(len(chords))]
 
-    scale = features.get("scale", "major")
-    scale_notes = (
-        [60, 62, 64, 65, 67, 69, 71]
-        if scale == "major"
-        else [60, 62, 63, 65, 67, 68, 70]
-    )
+    chord_len = beat * rng.choice([2, 3, 4], size=len(chords))
+    chord_end = np.cumsum(chord_len)
+    chord_start = chord_end - chord_len
+    per_chord = chords.shape[1]
 
-    beat = 60 / tempo
-    time_cursor = 0.0
+    intro = np.zeros(chords.size, dtype=NOTE_DTYPE)
+    intro["start"] = np.repeat(chord_start, per_chord)
+    intro["end"] = np.repeat(chord_end, per_chord)
+    intro["pitch"] = chords.ravel()
+    intro["velocity"] = CHORD_VELOCITY
 
-    # ===================== INTRO (CHORDS) =====================
-    for chord in chords:
-        duration = beat * random.choice([2, 3, 4])
-        for pitch in chord:
-            instrument.notes.append(
-                pretty_midi.Note(
-                    velocity=70,
-                    pitch=pitch,
-                    start=time_cursor,
-                    end=time_cursor + duration
-                )
-            )
-        time_cursor += duration
-
-    # ===================== MAIN MELODY (1 MIN) =====================
-    TARGET_DURATION = 60  # seconds
-
-    while time_cursor < TARGET_DURATION:
-        pitch = (
-            random.choice(scale_notes)
-            + random.choice(genre_cfg["octaves"])
-        )
-
-        duration = random.uniform(*genre_cfg["melody_gap"])
-
-        instrument.notes.append(
-            pretty_midi.Note(
-                velocity=random.randint(*genre_cfg["velocity"]),
-                pitch=pitch,
-                start=time_cursor,
-                end=time_cursor + duration
-            )
-        )
-        time_cursor += duration
-
-    midi.instruments.append(instrument)
-
-    filename = f"music_{int(time.time() * 1000)}.mid"
-    path = os.path.join("generated_music", filename)
-    midi.write(path)
-
-    duration = round(midi.get_end_time(), 2)
+    # ===================== MAIN MELODY =====================
+    scale = SCALES["major"] if features.get("scale", "major") == "major" else SCALES["minor"]
+    melody = _melody_blocks(rng, genre_cfg, scale, float(chord_end[-1]), duration)
+
+    notes = np.concatenate([intro, *melody])
+    notes["program"] = genre_cfg["instrument"]
+    return Score(notes, tempo=tempo)
+
+
+def _melody_blocks(rng, genre_cfg, scale, cursor: float, duration: float):
+    # Each MELODY_BLOCK_SECONDS window draws the same number of candidates
+    # (enough to fill it with the shortest notes) and keeps those starting
+    # inside it. The draws never depend on the total length, so a 3 minute
+    # song opens with exactly the 1 minute song for the same prompt.
+    gap_lo, gap_hi = genre_cfg["melody_gap"]
+    vel_lo, vel_hi = genre_cfg["velocity"]
+    octaves = np.array(genre_cfg["octaves"], dtype=np.int16)
+    per_block = int(np.ceil(MELODY_BLOCK_SECONDS / gap_lo)) + 1
+
+    while cursor < duration:
+        window_end = min(cursor + MELODY_BLOCK_SECONDS, duration)
+
+        lengths = rng.uniform(gap_lo, gap_hi, size=per_block)
+        pitches = rng.choice(scale, size=per_block) + rng.choice(octaves, size=per_block)
+        velocities = rng.integers(vel_lo, vel_hi + 1, size=per_block)
+
+        ends = cursor + np.cumsum(lengths)
+        starts = ends - lengths
+        n = int(np.searchsorted(starts, window_end, side="left"))
+
+        block = np.zeros(n, dtype=NOTE_DTYPE)
+        block["start"] = starts[:n]
+        block["end"] = ends[:n]
+        block["pitch"] = pitches[:n]
+        block["velocity"] = velocities[:n]
+        yield block
+
+        cursor = float(ends[n - 1])
+
+
+def generate_music(features, prompt: str, genre: str = "lofi", duration: float = DEFAULT_DURATION):
+    os.makedirs("generated_music", exist_ok=True)
+
+    score = compose_score(features, prompt, genre, duration)
+
+    path = new_midi_path()
+    score.write_midi(path)
+
+    duration = round(score.end_time, 2)
     return path, duration
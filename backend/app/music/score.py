@@ -0,0 +1,172 @@
+import struct
+
+import numpy as np
+import pretty_midi
+
+
+NOTE_DTYPE = np.dtype([
+    ("start", "f8"),
+    ("end", "f8"),
+    ("pitch", "i2"),
+    ("velocity", "i2"),
+    ("program", "i2"),
+    ("is_drum", "?"),
+])
+
+
+MIDI_RESOLUTION = 220  # ticks per beat, same as pretty_midi
+DRUM_CHANNEL = 9
+
+
+def pitch_to_hz(pitch):
+    return 440.0 * 2.0 ** ((np.asarray(pitch, dtype=np.float64) - 69.0) / 12.0)
+
+
+# ===================== NOTE INDEX =====================
+# Flat, start-sorted note table built once per song. Lets later stages
+# (F0 curves for singing, synthesis) reuse the melody without re-parsing
+# the MIDI file.
+class Score:
+    def __init__(self, notes: np.ndarray, tempo: float = 120.0):
+        notes = np.asarray(notes, dtype=NOTE_DTYPE)
+        # Stable by start: among notes starting together the later one wins
+        order = np.argsort(notes["start"], kind="stable")
+        self.notes = notes[order]
+        self.tempo = float(tempo)
+
+        melodic = self.notes[~self.notes["is_drum"]]
+        self._starts = melodic["start"]
+        self._ends = melodic["end"]
+        self._freqs = pitch_to_hz(melodic["pitch"])
+
+        # Longest-running note so far, to cover frames after a short note ends
+        # while an earlier, longer one is still sounding
+        self._max_end = np.maximum.accumulate(self._ends) if len(melodic) else self._ends
+        idx = np.arange(len(melodic))
+        self._max_end_idx = np.maximum.accumulate(np.where(self._ends == self._max_end, idx, 0))
+
+    @classmethod
+    def from_midi(cls, midi) -> "Score":
+        # midi: path, PrettyMIDI or an existing Score
+        if isinstance(midi, Score):
+            return midi
+        if not isinstance(midi, pretty_midi.PrettyMIDI):
+            midi = pretty_midi.PrettyMIDI(midi)
+
+        rows = [
+            (n.start, n.end, n.pitch, n.velocity, inst.program, inst.is_drum)
+            for inst in midi.instruments
+            for n in inst.notes
+        ]
+        _, tempi = midi.get_tempo_changes()
+        tempo = tempi[0] if len(tempi) else 120.0
+        return cls(np.array(rows, dtype=NOTE_DTYPE), tempo=tempo)
+
+    # ---------- MIDI export ----------
+    # Standard MIDI file built straight from the note table (format 1: a
+    # tempo track, then one track per instrument).
+    def to_midi_bytes(self, resolution: int = MIDI_RESOLUTION) -> bytes:
+        us_per_beat = int(6e7 / self.tempo)
+        ticks_per_second = resolution * 1e6 / us_per_beat
+
+        tempo_track = (
+            b"\x00\xff\x51\x03" + us_per_beat.to_bytes(3, "big")
+            + b"\x00\xff\x58\x04\x04\x02\x18\x08"  # 4/4
+            + b"\x00\xff\x2f\x00"
+        )
+        tracks = [tempo_track]
+
+        keys = np.unique(self.notes[["program", "is_drum"]]) if len(self.notes) else []
+        melodic_channels = (c for c in range(16) if c != DRUM_CHANNEL)
+        for key in keys:
+            program, is_drum = int(key["program"]), bool(key["is_drum"])
+            channel = DRUM_CHANNEL if is_drum else next(melodic_channels, 15)
+            notes = self.notes[(self.notes["program"] == program) & (self.notes["is_drum"] == is_drum)]
+            tracks.append(_note_track(notes, channel, program, ticks_per_second))
+
+        header = b"MThd" + struct.pack(">IHHH", 6, 1, len(tracks), resolution)
+        return header + b"".join(b"MTrk" + struct.pack(">I", len(t)) + t for t in tracks)
+
+    def write_midi(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.to_midi_bytes())
+
+    def __len__(self):
+        return len(self.notes)
+
+    @property
+    def end_time(self) -> float:
+        return float(self.notes["end"].max()) if len(self.notes) else 0.0
+
+    def active_notes(self, frame_times) -> np.ndarray:
+        # Index (into the melodic notes) sounding at each frame, -1 for silence
+        t = np.asarray(frame_times, dtype=np.float64)
+        active = np.full(t.shape, -1, dtype=np.int64)
+        if not len(self._starts):
+            return active
+
+        # Latest note starting at or before each frame...
+        k = np.searchsorted(self._starts, t, side="right") - 1
+        started = k >= 0
+        k = np.maximum(k, 0)
+
+        # ...if it has already ended, the longest-running earlier note may still sound
+        own = started & (self._ends[k] >= t)
+        alt = self._max_end_idx[k]
+        held = started & ~own & (self._ends[alt] >= t)
+
+        active[own] = k[own]
+        active[held] = alt[held]
+        return active
+
+    def f0_curve(self, frame_times) -> np.ndarray:
+        active = self.active_notes(frame_times)
+        f0 = np.zeros(active.shape)
+        sounding = active >= 0
+        f0[sounding] = self._freqs[active[sounding]]
+        return f0
+
+
+# ===================== SMF ENCODING =====================
+def _note_track(notes: np.ndarray, channel: int, program: int, ticks_per_second: float) -> bytes:
+    on = np.round(notes["start"] * ticks_per_second).astype(np.int64)
+    off = np.maximum(np.round(notes["end"] * ticks_per_second).astype(np.int64), on + 1)
+    n = len(notes)
+
+    ticks = np.concatenate([on, off])
+    is_on = np.concatenate([np.ones(n, dtype=bool), np.zeros(n, dtype=bool)])
+    pitch = np.concatenate([notes["pitch"], notes["pitch"]]).astype(np.uint8)
+    velocity = np.where(is_on, np.concatenate([notes["velocity"], notes["velocity"]]), 0).astype(np.uint8)
+
+    # By tick, note-offs before note-ons so repeated pitches retrigger cleanly
+    order = np.lexsort((is_on, ticks))
+    ticks, is_on, pitch, velocity = ticks[order], is_on[order], pitch[order], velocity[order]
+    deltas = np.diff(ticks, prepend=0)
+    status = np.where(is_on, 0x90, 0x80).astype(np.uint8) | channel
+
+    return (
+        bytes([0x00, 0xC0 | channel, program & 0x7F])
+        + _encode_events(deltas, status, pitch, velocity)
+        + b"\x00\xff\x2f\x00"
+    )
+
+
+def _encode_events(deltas, status, data1, data2) -> bytes:
+    # <variable-length delta><status><data1><data2> for every event at once
+    n_bytes = 1 + (deltas >= 1 << 7) + (deltas >= 1 << 14) + (deltas >= 1 << 21)
+    sizes = n_bytes + 3
+    offsets = np.cumsum(sizes) - sizes
+    out = np.zeros(int(sizes.sum()), dtype=np.uint8)
+
+    # Delta time: 7 bits per byte, most significant first, high bit = more follows
+    for k in range(4):
+        has = n_bytes > k
+        remaining = n_bytes[has] - 1 - k
+        group = (deltas[has] >> (7 * remaining)) & 0x7F
+        out[offsets[has] + k] = group | np.where(remaining > 0, 0x80, 0)
+
+    end = offsets + n_bytes
+    out[end] = status
+    out[end + 1] = data1
+    out[end + 2] = data2
+    return out.tobytes()
@@ -0,0 +1,63 @@
+import numpy as np
+
+from app.nlp.tokenizer import inflections
+
+
+# ===================== KEYWORD INDEX =====================
+# label → keywords map compiled once into surface form → ((label index,
+# weight), ...) over every inflection of every keyword, so scoring is a single
+# pass over the tokens with one dict lookup each.
+class KeywordIndex:
+    def __init__(self, keyword_map: dict, weight: float = 1.0):
+        self.labels = list(keyword_map)
+        index = {}
+        for i, keywords in enumerate(keyword_map.values()):
+            for keyword in keywords:
+                # A form reached from two keywords of one label still counts once
+                for form in inflections(keyword):
+                    index.setdefault(form, {})[i] = weight
+        self._index = {s: tuple(hits.items()) for s, hits in index.items()}
+
+    def scores(self, tokens) -> np.ndarray:
+        out = np.zeros(len(self.labels))
+        for t in tokens:
+            for i, w in self._index.get(t, ()):
+                out[i] += w
+        return out
+
+    def distribution(self, scores: np.ndarray) -> dict:
+        # Share of the total score per label, {} when nothing matched
+        total = scores.sum()
+        if total <= 0:
+            return {}
+        return {label: round(float(s / total), 4) for label, s in zip(self.labels, scores) if s > 0}
+
+    def best(self, scores: np.ndarray, default: str) -> str:
+        # Ties go to the label listed first in the map
+        return self.labels[int(np.argmax(scores))] if scores.max(initial=0) > 0 else default
+
+    # ---------- batch ----------
+    def score_batch(self, token_lists) -> np.ndarray:
+        # (n_texts, n_labels) score matrix, accumulated in one np.add.at
+        rows, cols, weights = [], [], []
+        for r, tokens in enumerate(token_lists):
+            for t in tokens:
+                for i, w in self._index.get(t, ()):
+                    rows.append(r)
+                    cols.append(i)
+                    weights.append(w)
+
+        out = np.zeros((len(token_lists), len(self.labels)))
+        np.add.at(out, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), np.array(weights))
+        return out
+
+    def best_batch(self, scores: np.ndarray, default: str) -> np.ndarray:
+        labels = np.array(self.labels + [default], dtype=object)
+        picked = np.argmax(scores, axis=1) if scores.shape[1] else np.zeros(len(scores), dtype=np.int64)
+        picked[scores.max(axis=1, initial=0) <= 0] = len(self.labels)
+        return labels[picked]
+
+    @staticmethod
+    def normalize_batch(scores: np.ndarray) -> np.ndarray:
+        totals = scores.sum(axis=1, keepdims=True)
+        return np.divide(scores, totals, out=np.zeros_like(scores), where=totals > 0)
@@ -1,26 +1,13 @@
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-import os
+from app.nlp.matcher import KeywordIndex
+from app.nlp.tokenizer import STOPWORDS, tokenize
 
-# ----------------------------
-# NLTK Setup
-# ----------------------------
-nltk_data_path = os.path.join(os.path.expanduser("~"), "AppData", "Roaming", "nltk_data")
-os.makedirs(nltk_data_path, exist_ok=True)
-nltk.data.path.append(nltk_data_path)
-
-nltk.download("punkt", download_dir=nltk_data_path, quiet=True)
-nltk.download("stopwords", download_dir=nltk_data_path, quiet=True)
-
-stop_words = set(stopwords.words("english"))
+stop_words = STOPWORDS
 
 # ----------------------------
 # Preprocess
 # ----------------------------
 def preprocess(text: str):
-    tokens = word_tokenize(text.lower())
-    tokens = [t for t in tokens if t.isalpha() and t not in stop_words]
+    tokens = [t for t in tokenize(text) if t not in stop_words]
     return tokens
 
 # ----------------------------
@@ -36,15 +23,13 @@ emotion_map = {
     "calm": ["peace", "relax", "calm", "quiet", "slow"]
 }
 
-def detect_emotion(tokens):
-    scores = {emotion: 0 for emotion in emotion_map}
-    for emotion, keywords in emotion_map.items():
-        for t in tokens:
-            if t in keywords:
-                scores[emotion] += 2   # 🔥 boost weight
+emotion_index = KeywordIndex(emotion_map, weight=2)   # 🔥 boost weight
 
-    detected = max(scores, key=scores.get)
-    return detected if scores[detected] > 0 else "neutral"
+def emotion_scores(tokens):
+    return emotion_index.scores(tokens)
+
+def detect_emotion(tokens):
+    return emotion_index.best(emotion_scores(tokens), default="neutral")
 
 # ----------------------------
 # Genre Detection
@@ -57,12 +42,13 @@ genre_map = {
     "ambient": ["space", "atmosphere", "background"]
 }
 
+genre_index = KeywordIndex(genre_map)
+
+def genre_scores(tokens):
+    return genre_index.scores(tokens)
+
 def detect_genre(tokens):
-    for genre, keywords in genre_map.items():
-        for t in tokens:
-            if t in keywords:
-                return genre
-    return "pop"   # 🎵 better default for energy
+    return genre_index.best(genre_scores(tokens), default="pop")   # 🎵 better default for energy
 
 # ----------------------------
 # Map Emotion → Music Features
@@ -96,13 +82,61 @@ def map_to_music_features(emotion, genre):
 # ----------------------------
 def process_text(text: str):
     tokens = preprocess(text)
-    emotion = detect_emotion(tokens)
-    genre = detect_genre(tokens)
+    emo_scores = emotion_scores(tokens)
+    gen_scores = genre_scores(tokens)
+    emotion = emotion_index.best(emo_scores, default="neutral")
+    genre = genre_index.best(gen_scores, default="pop")
     features = map_to_music_features(emotion, genre)
 
     return {
         "tokens": tokens,
         "emotion": emotion,
         "genre": genre,
+        "emotion_scores": emotion_index.distribution(emo_scores),
+        "genre_scores": genre_index.distribution(gen_scores),
         "music_features": features
     }
+
+# ----------------------------
+# Batch Pipeline
+# ----------------------------
+def analyze_texts(texts):
+    # Analytics over many prompts: score matrices (rows = texts, columns =
+    # *_labels, each row sums to 1 or is all zero) plus the detected labels
+    token_lists = [preprocess(t) for t in texts]
+    emo = emotion_index.score_batch(token_lists)
+    gen = genre_index.score_batch(token_lists)
+
+    return {
+        "tokens": token_lists,
+        "emotions": emotion_index.best_batch(emo, default="neutral"),
+        "genres": genre_index.best_batch(gen, default="pop"),
+        "emotion_labels": emotion_index.labels,
+        "emotion_scores": KeywordIndex.normalize_batch(emo),
+        "genre_labels": genre_index.labels,
+        "genre_scores": KeywordIndex.normalize_batch(gen),
+    }
+
+
+def process_texts(texts):
+    # Same result as process_text per item; repeated prompts are analysed once
+    unique = list(dict.fromkeys(text.lower().strip() for text in texts))
+    batch = analyze_texts(unique)
+
+    by_key = {}
+    for i, key in enumerate(unique):
+        emotion, genre = str(batch["emotions"][i]), str(batch["genres"][i])
+        by_key[key] = {
+            "tokens": batch["tokens"][i],
+            "emotion": emotion,
+            "genre": genre,
+            "emotion_scores": _row_distribution(batch["emotion_labels"], batch["emotion_scores"][i]),
+            "genre_scores": _row_distribution(batch["genre_labels"], batch["genre_scores"][i]),
+            "music_features": map_to_music_features(emotion, genre)
+        }
+
+    return [by_key[text.lower().strip()] for text in texts]
+
+
+def _row_distribution(labels, row):
+    return {label: round(float(p), 4) for label, p in zip(labels, row) if p > 0}
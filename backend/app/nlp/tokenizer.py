@@ -0,0 +1,83 @@
+import re
+from functools import lru_cache
+
+
+# ===================== TOKENIZER =====================
+# Bundled replacement for nltk's word_tokenize + stopwords corpus: no data
+# downloads, nothing to load at startup. The pipeline only keeps alphabetic,
+# non-stopword tokens, so splitting on runs of letters gives the same tokens.
+_WORD = re.compile(r"[^\W\d_]+")
+
+# NLTK's English stopword list
+STOPWORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours
+yourself yourselves he him his himself she she's her hers herself it it's its
+itself they them their theirs themselves what which who whom this that that'll
+these those am is are was were be been being have has had having do does did
+doing a an the and but if or because as until while of at by for with about
+against between into through during before after above below to from up down
+in out on off over under again further then once here there when where why how
+all any both each few more most other some such no nor not only own same so
+than too very s t can will just don don't should should've now d ll m o re ve
+y ain aren aren't couldn couldn't didn didn't doesn doesn't hadn hadn't hasn
+hasn't haven haven't isn isn't ma mightn mightn't mustn mustn't needn needn't
+shan shan't shouldn shouldn't wasn wasn't weren weren't won won't wouldn
+wouldn't
+""".split())
+
+
+def tokenize(text: str):
+    return _WORD.findall(text.lower())
+
+
+# ===================== INFLECTIONS =====================
+# Keywords are expanded into their regular inflected forms (cry → cries /
+# cried / crying, dance → dancing, lonely → loneliness) and tokens are looked
+# up as written. Matching only runs from a keyword towards its own forms, so
+# unrelated short words never meet (hat ≠ hate, made ≠ mad, rag ≠ rage), which
+# a suffix stripper applied to tokens and keywords alike can't guarantee.
+_VOWELS = frozenset("aeiou")
+_SUFFIXES = ("s", "ed", "ing", "er", "est", "ly", "ness", "ful")
+# Regular forms that mostly mean something else in prompts
+_UNRELATED = frozenset({"tearing", "madly"})
+
+
+def _doubles(base: str) -> bool:
+    # One-syllable consonant-vowel-consonant: drum → drumming, sad → sadder
+    if len(base) < 3 or base[-1] in _VOWELS or base[-1] in "wxy":
+        return False
+    if base[-2] not in _VOWELS or base[-3] in _VOWELS:
+        return False
+    return len(re.findall(r"[aeiou]+", base)) == 1
+
+
+def _attach(base: str, suffix: str) -> str:
+    if suffix == "s":
+        if base.endswith(("s", "x", "z", "ch", "sh")):
+            return base + "es"
+        suffix = "es" if base.endswith("y") and base[-2:-1] not in _VOWELS else "s"
+    if base.endswith("y") and len(base) > 2 and base[-2] not in _VOWELS and suffix[0] != "i":
+        return base[:-1] + "i" + suffix                 # cried, happiness, angrily
+    if suffix[0] in _VOWELS:
+        if base.endswith("e"):
+            return base[:-1] + suffix                   # dancing, hated
+        if _doubles(base):
+            return base + base[-1] + suffix             # drumming
+    return base + suffix
+
+
+@lru_cache(maxsize=4096)
+def inflections(word: str) -> frozenset:
+    # Surface forms that count as `word`. Keywords that are inflected already
+    # also go through their base: excited → excite → exciting, drums → drum.
+    if word.endswith("ed") and len(word) > 4:
+        bases = {word[:-1], word[:-2]}
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")) and len(word) > 3:
+        bases = {word[:-1]}
+    else:
+        bases = {word}
+
+    forms = {word} | bases
+    for base in bases:
+        forms.update(_attach(base, suffix) for suffix in _SUFFIXES)
+    return frozenset(forms - _UNRELATED)
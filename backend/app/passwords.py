@@ -0,0 +1,33 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+# bcrypt cost factor; raising it makes existing hashes get upgraded on next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads reserved for hashing, so a login burst can't starve the shared threadpool
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(pwd_context.hash, password)
+
+
+async def verify_password(password: str, password_hash: str):
+    # Returns (ok, new_hash); new_hash is set when the stored hash uses
+    # outdated parameters (e.g. BCRYPT_ROUNDS was raised) and should be saved
+    return await _run(pwd_context.verify_and_update, password, password_hash)
+
+
+def shutdown():
+    _executor.shutdown(wait=False)
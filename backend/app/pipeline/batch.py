@@ -0,0 +1,55 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.lyrics.cache import get_or_generate_lyrics
+from app.lyrics.client import MAX_CONCURRENCY as LYRICS_CONCURRENCY
+from app.lyrics.generator import lyrics_minutes
+from app.nlp.pipeline import process_texts
+from app.pipeline.cache import normalize_prompt
+from app.pipeline.runner import build_midi
+
+
+MAX_BATCH_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "32"))
+
+
+# ===================== BATCH PREP =====================
+# Runs the cheap, shared front of the pipeline for a whole batch in the API
+# process: one NLP pass, MIDI composition, and lyrics with at most
+# LYRICS_CONCURRENCY requests in flight (one per distinct prompt/emotion/length).
+# Returns, per item, the `precomputed` dict for run_generation or the
+# exception that item failed with.
+def prepare_batch(items):
+    # items: [(prompt, genre, duration)]
+    analyses = process_texts([prompt for prompt, _, _ in items])
+
+    prepared = []
+    for (prompt, genre, duration), nlp in zip(items, analyses):
+        try:
+            midi, _ = build_midi(prompt, genre, nlp["music_features"], duration=duration)
+            prepared.append({"nlp": nlp, "midi": midi})
+        except Exception as e:
+            prepared.append(e)
+
+    with ThreadPoolExecutor(max_workers=LYRICS_CONCURRENCY) as pool:
+        def _key(prompt, pre):
+            return normalize_prompt(prompt), pre["nlp"]["emotion"], lyrics_minutes(pre["midi"]["duration"])
+
+        requests = {}
+        for (prompt, _, _), pre in zip(items, prepared):
+            if isinstance(pre, Exception):
+                continue
+            key = _key(prompt, pre)
+            if key not in requests:
+                requests[key] = pool.submit(
+                    get_or_generate_lyrics, prompt, pre["nlp"]["emotion"], pre["midi"]["duration"]
+                )
+
+        for i, ((prompt, _, _), pre) in enumerate(zip(items, prepared)):
+            if isinstance(pre, Exception):
+                continue
+            try:
+                pre["lyrics"], _ = requests[_key(prompt, pre)].result()
+            except Exception as e:
+                prepared[i] = e
+
+    return prepared
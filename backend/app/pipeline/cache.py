@@ -0,0 +1,196 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+
+import numpy as np
+
+from app.audio.buffer import AudioBuffer
+
+
+# Bump whenever generation or rendering changes what a stage produces,
+# so old artifacts stop matching new requests.
+CODE_VERSION = "2"
+
+CACHE_DIR = os.getenv("RENDER_CACHE_DIR", os.path.join("generated_music", "cache"))
+CACHE_MAX_BYTES = int(float(os.getenv("RENDER_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+# Stores only bump a running byte total; the directory is walked when that
+# total goes over budget, or this often to pick up other workers' writes
+CACHE_RESCAN_SECONDS = float(os.getenv("RENDER_CACHE_RESCAN_SECONDS", "300"))
+# An over-budget walk trims down to this fraction of the budget, so a full
+# cache is not walked again on the very next store
+CACHE_LOW_WATER = 0.9
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Same normalization compose_score uses to seed the melody
+    return (prompt or "").lower().strip()
+
+
+def cache_key(*parts) -> str:
+    raw = "\x1f".join([CODE_VERSION, *(str(p) for p in parts)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _link_or_copy(src: str, dst: str, copy: bool = False):
+    # Hard links share the bytes on disk; fall back to a copy across devices
+    if not copy:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+
+# ===================== CONTENT-ADDRESSED CACHE =====================
+class ArtifactCache:
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None      # bytes as of the last walk, plus stores since
+        self._scanned_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def path(self, stage: str, key: str, ext: str) -> str:
+        return os.path.join(self.root, stage, key + ext)
+
+    def fetch(self, stage: str, key: str, ext: str, dest: str, copy: bool = False) -> bool:
+        # Materialize a cached artifact at dest; False on a miss.
+        # copy: give dest its own inode, for files whose mtime must not move
+        # when the cache entry is touched
+        if not self.enabled:
+            return False
+
+        src = self.path(stage, key, ext)
+        try:
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            if os.path.exists(dest):
+                os.remove(dest)
+            _link_or_copy(src, dest, copy)
+            os.utime(src)  # mark as recently used
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store(self, stage: str, key: str, ext: str, src: str, copy: bool = False):
+        if not self.enabled:
+            return
+
+        dst = self.path(stage, key, ext)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+        # Write under a temp name first so readers never see a partial file
+        tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+        _link_or_copy(src, tmp, copy)
+        self._commit(tmp, dst)
+
+    def load_audio(self, stage: str, key: str):
+        if not self.enabled:
+            return None
+
+        path = self.path(stage, key, ".wav")
+        try:
+            buf = AudioBuffer.read(path)
+            os.utime(path)
+        except (FileNotFoundError, RuntimeError):
+            # RuntimeError: soundfile could not open it (evicted mid-read)
+            return None
+        return buf
+
+    def store_audio(self, stage: str, key: str, buf: AudioBuffer):
+        if not self.enabled:
+            return
+
+        dst = self.path(stage, key, ".wav")
+        tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+        buf.write(tmp, format="WAV")
+        self._commit(tmp, dst)
+
+    def load_arrays(self, stage: str, key: str):
+        # Dict of named NumPy arrays, or None on a miss
+        if not self.enabled:
+            return None
+
+        path = self.path(stage, key, ".npz")
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)
+        except (FileNotFoundError, EOFError, ValueError, zipfile.BadZipFile):
+            # Evicted or cut short mid-read
+            return None
+        return arrays
+
+    def store_arrays(self, stage: str, key: str, **arrays):
+        if not self.enabled:
+            return
+
+        dst = self.path(stage, key, ".npz")
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        self._commit(tmp, dst)
+
+    def _commit(self, tmp: str, dst: str):
+        # Move a finished temp file into place and count it in the running total
+        try:
+            replaced = os.stat(dst).st_size
+        except FileNotFoundError:
+            replaced = 0
+        size = os.stat(tmp).st_size
+        os.replace(tmp, dst)
+
+        with self._lock:
+            if self._total is not None:
+                self._total += size - replaced
+        self.evict()
+
+    def evict(self, force: bool = False):
+        # Drop least recently used artifacts until the cache fits its budget.
+        # Walks the directory only when the running total is over budget (or
+        # unknown), the rescan interval has passed, or force is set.
+        with self._lock:
+            fresh = time.monotonic() - self._scanned_at < CACHE_RESCAN_SECONDS
+            if not force and fresh and self._total is not None and self._total <= self.max_bytes:
+                return
+
+            entries = []
+            total = 0
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+
+            if total > self.max_bytes:
+                target = self.max_bytes * CACHE_LOW_WATER
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+
+            self._total = total
+            self._scanned_at = time.monotonic()
+
+
+render_cache = ArtifactCache()
@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Stage:
+    def __init__(self, name: str, fn, deps=()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+
+def _check_graph(stages):
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate stage names in pipeline")
+
+    known = set(names)
+    for s in stages:
+        missing = [d for d in s.deps if d not in known]
+        if missing:
+            raise ValueError(f"Stage '{s.name}' depends on unknown stage(s): {missing}")
+
+    # Kahn's algorithm: every stage must be reachable without a cycle
+    remaining = {s.name: set(s.deps) for s in stages}
+    while remaining:
+        ready = [n for n, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Pipeline has a dependency cycle: {sorted(remaining)}")
+        for n in ready:
+            del remaining[n]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+# ===================== EXECUTOR =====================
+# Runs every stage as soon as its dependencies are done. A stage function
+# receives its dependencies' results as keyword arguments. Returns
+# (results, timings) with seconds per stage; on_stage(name, "started" |
+# "finished") is called from the calling thread.
+def run_dag(stages, max_workers: int = 4, on_stage=None):
+    _check_graph(stages)
+
+    results = {}
+    timings = {}
+    started_at = {}
+    waiting = list(stages)
+    running = {}
+
+    def _notify(name, event):
+        if on_stage is not None:
+            on_stage(name, event)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            while waiting or running:
+                for stage in [s for s in waiting if all(d in results for d in s.deps)]:
+                    waiting.remove(stage)
+                    _notify(stage.name, "started")
+                    started_at[stage.name] = time.perf_counter()
+                    kwargs = {d: results[d] for d in stage.deps}
+                    running[pool.submit(stage.fn, **kwargs)] = stage.name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    timings[name] = round(time.perf_counter() - started_at[name], 3)
+                    _notify(name, "finished")
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+
+    return results, timings
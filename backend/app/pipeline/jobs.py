@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from app.database import SessionLocal
+from app.music.generator import DEFAULT_DURATION
+from app.models.music import MusicGeneration
+from app.pipeline.runner import STAGES, run_generation
+
+
+# Worker processes run the CPU-heavy stages (synthesis, singing, mixing)
+MAX_WORKERS = int(os.getenv("MUSIC_WORKERS", "2"))
+# Jobs accepted but not yet finished; beyond this new submissions are rejected
+MAX_PENDING = int(os.getenv("MUSIC_QUEUE_SIZE", "32"))
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+# ===================== DB HELPERS =====================
+def _update_job(job_id: int, **fields):
+    db = SessionLocal()
+    try:
+        db.query(MusicGeneration).filter(MusicGeneration.id == job_id).update(fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+# ===================== WORKER (runs in child process) =====================
+def _run_job(job_id: int, prompt: str, genre: str, voice: str, duration: float = DEFAULT_DURATION):
+    _update_job(job_id, status="running", stage=STAGES[0], progress=0.0)
+
+    # Branches run in parallel, so report every stage currently in flight
+    active, finished = [], []
+
+    def on_stage(name, event):
+        if event == "started":
+            active.append(name)
+        else:
+            active.remove(name)
+            finished.append(name)
+        _update_job(
+            job_id,
+            stage=",".join(active) or None,
+            progress=round(len(finished) / len(STAGES), 2),
+        )
+
+    try:
+        result = run_generation(prompt, genre, voice, on_stage=on_stage, duration=duration)
+    except Exception as e:
+        print(traceback.format_exc())
+        _update_job(job_id, status="failed", error=str(e))
+        return
+
+    _update_job(
+        job_id,
+        status="completed",
+        stage=None,
+        progress=1.0,
+        emotion=result["emotion"],
+        tempo=result["tempo"],
+        scale=result["scale"],
+        midi_path=result["midi_path"],
+        wav_path=result["wav_path"],
+        duration=result["duration"],
+        lyrics=result["lyrics"],
+    )
+
+
+# Batch items: NLP, MIDI and lyrics were prepared by the API process
+def _render(prompt: str, genre: str, voice: str, precomputed: dict, duration: float = DEFAULT_DURATION) -> dict:
+    return run_generation(prompt, genre, voice, precomputed=precomputed, duration=duration)
+
+
+# ===================== QUEUE =====================
+class JobQueue:
+    def __init__(self, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # "spawn" keeps workers clean of the server's threads and DB connections
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError("Too many generation jobs in progress, try again later")
+            self._pending += 1
+            executor = self._get_executor()
+
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, job_id: int, prompt: str, genre: str, voice: str, duration: float = DEFAULT_DURATION):
+        future = self._submit(_run_job, job_id, prompt, genre, voice, duration)
+        future.add_done_callback(partial(self._on_done, job_id))
+
+    def submit_render(self, prompt: str, genre: str, voice: str, precomputed: dict, duration: float = DEFAULT_DURATION):
+        # Future resolving to run_generation's result; shares workers and the
+        # pending limit with queued jobs
+        return self._submit(_render, prompt, genre, voice, precomputed, duration)
+
+    def _on_done(self, job_id: int, future):
+
+        if future.cancelled():
+            _update_job(job_id, status="failed", error="Server shut down before the job started")
+            return
+
+        # The worker records its own failures; this catches crashed processes
+        error = future.exception()
+        if error is not None:
+            _update_job(job_id, status="failed", error=str(error) or type(error).__name__)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,318 @@
+import os
+import queue
+import threading
+import time
+
+from app.nlp.pipeline import process_text
+from app.music.generator import DEFAULT_DURATION, compose_score, new_midi_path
+from app.music.score import Score
+from app.lyrics.cache import get_or_generate_lyrics
+from app.audio.converter import BLOCK_SECONDS, midi_to_wav
+from app.audio.synth import SAMPLE_RATE as SYNTH_SAMPLE_RATE, SYNTH_BACKEND
+from app.audio.mixer import merge_audio
+from app.audio.tts import prefetch_lines, synthesize_lines
+from app.audio.singing import SINGING_TIER, sing
+from app.audio.buffer import DEBUG_INTERMEDIATES, debug_dump, iter_blocks, read_blocks
+from app.pipeline.cache import cache_key, normalize_prompt, render_cache
+from app.pipeline.dag import Stage, run_dag
+
+
+STAGES = ("nlp", "midi", "instrumental", "lyrics", "tts", "singing", "mix")
+
+# Threads per request: the instrumental and vocal branches run concurrently
+PIPELINE_THREADS = int(os.getenv("PIPELINE_THREADS", "4"))
+
+# Songs longer than this render the instrumental straight to disk in blocks
+# instead of holding it in memory, so peak memory stays flat for 10 minute tracks
+STREAM_RENDER_SECONDS = float(os.getenv("STREAM_RENDER_SECONDS", "120"))
+
+
+# ===================== LYRICS → TTS PREP =====================
+SUNG_SECTIONS = ("verse", "chorus", "bridge")
+
+
+# Sections in sung order: verse, chorus, chorus, bridge, chorus. Repeated
+# sections are the same lines, so line-level TTS synthesizes them once.
+def lyrics_to_sections(lyrics: str):
+    lines = [l.strip() for l in lyrics.split("\n") if l.strip()]
+
+    verse, chorus, bridge = [], [], []
+    current = None
+
+    for line in lines:
+        lower = line.lower()
+        if lower.startswith("verse"):
+            current = verse
+            continue
+        elif lower.startswith("chorus"):
+            current = chorus
+            continue
+        elif lower.startswith("bridge"):
+            current = bridge
+            continue
+
+        if current is not None:
+            current.append(line)
+
+    sections = []
+    if verse:
+        sections.append(("verse", verse))
+    if chorus:
+        sections += [("chorus", chorus), ("chorus", chorus)]
+    if bridge:
+        sections.append(("bridge", bridge))
+    if chorus:
+        sections.append(("chorus", chorus))
+
+    # No section headers at all: sing every line once
+    if not sections and lines:
+        sections.append(("verse", lines))
+    return sections
+
+
+def streamed_section_lines(text: str):
+    # Lines of one streamed lyrics section that lyrics_to_sections will sing;
+    # none for sections it skips (intro, outro, text before any header)
+    lines = [l.strip() for l in text.split("\n") if l.strip()]
+    if not lines or not lines[0].lower().startswith(SUNG_SECTIONS):
+        return []
+    return [l for l in lines[1:] if not l.lower().startswith(SUNG_SECTIONS)]
+
+
+# ===================== MIDI =====================
+# The parsed note table travels with the path so later stages never re-read
+# the MIDI file. Returns ({"path", "duration", "score"}, cache_hit).
+def build_midi(prompt: str, genre: str, features: dict, midi_path: str = None, duration: float = DEFAULT_DURATION):
+    key = cache_key("midi", normalize_prompt(prompt), genre, duration)
+    midi_path = midi_path or new_midi_path()
+
+    if render_cache.fetch("midi", key, ".mid", midi_path):
+        hit = True
+        score = Score.from_midi(midi_path)
+    else:
+        hit = False
+        os.makedirs(os.path.dirname(midi_path), exist_ok=True)
+        score = compose_score(features, prompt, genre=genre, duration=duration)
+        score.write_midi(midi_path)
+        render_cache.store("midi", key, ".mid", midi_path)
+
+    return {"path": midi_path, "duration": round(score.end_time, 2), "score": score}, hit
+
+
+# ===================== FULL PIPELINE =====================
+def run_generation(prompt: str, genre: str = "lofi", voice: str = "male", on_stage=None, on_audio=None,
+                   precomputed: dict = None, duration: float = DEFAULT_DURATION) -> dict:
+    # on_audio(name, AudioBuffer) receives instrumental blocks as they render
+    # precomputed: "nlp" / "midi" / "lyrics" results already produced by the
+    # caller (batch generation); those stages just hand them through
+    precomputed = precomputed or {}
+    # Cache keys: the instrumental depends on (prompt, genre, synth), so
+    # changing only the voice still reuses the MIDI, instrumental and lyrics.
+    # Speech is cached per lyrics line and voice (synthesize_lines). Lyrics
+    # live in the lyrics_cache table, keyed by (prompt, emotion, minutes).
+    # Every key includes the requested duration.
+    # Everything downstream of TTS is also keyed on the lyrics text and a hash
+    # of the speech samples: lyrics rows expire and the emotion-bank fallback
+    # is never stored, and the speech depends on which TTS engine answered and
+    # on the line / section gaps.
+    norm = normalize_prompt(prompt)
+    synth_id = f"{SYNTH_BACKEND}@{SYNTH_SAMPLE_RATE}"
+    keys = {
+        "instrumental": cache_key("instrumental", norm, genre, duration, synth_id),
+    }
+    vocal_parts = (norm, genre, voice, duration)
+    stream_to_disk = duration > STREAM_RENDER_SECONDS
+    hits = {}
+
+    def _cached_file(stage, key, dest, produce, copy=False):
+        ext = os.path.splitext(dest)[1]
+        if render_cache.fetch(stage, key, ext, dest, copy=copy):
+            hits[stage] = True
+            return dest
+        hits[stage] = False
+        path = produce()
+        render_cache.store(stage, key, ext, path, copy=copy)
+        return path
+
+    # 🧠 NLP
+    def nlp():
+        if "nlp" in precomputed:
+            return precomputed["nlp"]
+        return process_text(prompt)
+
+    # 🎵 MIDI generation (GENRE AWARE)
+    def midi(nlp):
+        if "midi" in precomputed:
+            return precomputed["midi"]
+        result, hits["midi"] = build_midi(prompt, genre, nlp["music_features"], duration=duration)
+        return result
+
+    # Audio stages pass AudioBuffers along in memory; only the final mix
+    # (plus cache entries) is written, intermediates only with AUDIO_DEBUG=1
+
+    # 🔊 MIDI → audio (rendered straight from the in-memory score)
+    def instrumental(midi):
+        midi_path = midi["path"]
+        on_block = None if on_audio is None else (lambda block: on_audio("instrumental", block))
+
+        if stream_to_disk:
+            # Long song: a WAV path instead of a buffer, the mixer streams it
+            wav_path = midi_path.replace(".mid", "_instrumental.wav")
+            path = _cached_file(
+                "instrumental", keys["instrumental"], wav_path,
+                lambda: midi_to_wav(midi["score"], wav_path, on_block=on_block),
+            )
+            if hits["instrumental"] and on_block is not None:
+                for block in read_blocks(path, BLOCK_SECONDS):
+                    on_block(block)
+            return path
+
+        buf = render_cache.load_audio("instrumental", keys["instrumental"])
+        hits["instrumental"] = buf is not None
+        if buf is None:
+            buf = midi_to_wav(midi["score"], on_block=on_block)
+            render_cache.store_audio("instrumental", keys["instrumental"], buf)
+        elif on_block is not None:
+            for block in iter_blocks(buf, int(BLOCK_SECONDS * buf.sample_rate)):
+                on_block(block)
+
+        debug_dump(buf, midi_path.replace(".mid", "_instrumental.wav"))
+        return buf
+
+    # ✍️ Lyrics, streamed from the model: each finished section's lines start
+    # TTS right away, so the first verse is spoken while the rest is written
+    prefetched = {}
+
+    def on_section(text):
+        lines = [l for l in streamed_section_lines(text) if l not in prefetched]
+        prefetched.update(prefetch_lines(lines, voice=voice))
+
+    def lyrics(nlp, midi):
+        if "lyrics" in precomputed:
+            return precomputed["lyrics"]
+        text, source = get_or_generate_lyrics(prompt, nlp["emotion"], midi["duration"], on_section=on_section)
+        hits["lyrics"] = source != "llm"
+        return text
+
+    # 🎤 Lyrics → TTS, one call per distinct line
+    vocal_timing = []
+
+    def tts(lyrics, midi):
+        midi_path = midi["path"]
+        stats = {}
+        buf, timing = synthesize_lines(lyrics_to_sections(lyrics), voice=voice, stats=stats, prefetched=prefetched)
+        hits["tts"] = stats["cached"] == stats["unique"]
+        if not buf.frames:
+            raise RuntimeError("TTS audio generation failed")
+        vocal_timing.extend(timing)
+        debug_dump(buf, midi_path.replace(".mid", "_speech.wav"))
+        return buf
+
+    # 🎶 Singing-style effect (optional)
+    def singing(tts, midi, lyrics):
+        midi_path = midi["path"]
+        # The WORLD analysis depends on the speech only, not the melody, so a
+        # new genre for the same speech reuses it
+        speech_id = tts.digest()
+        analysis_key = cache_key("world", speech_id, SINGING_TIER)
+        key = cache_key("singing", *vocal_parts, SINGING_TIER, lyrics, speech_id)
+
+        buf = render_cache.load_audio("singing", key)
+        hits["singing"] = buf is not None
+        if buf is None:
+            try:
+                buf = sing(tts, midi["score"], voice=voice, analysis_key=analysis_key)
+            except Exception:
+                # Not cached: the plain speech is only a fallback
+                return tts
+            render_cache.store_audio("singing", key, buf)
+
+        debug_dump(buf, midi_path.replace(".mid", "_vocal.wav"))
+        return buf
+
+    # 🎼 Merge audio
+    def mix(instrumental, singing, midi, lyrics, tts):
+        midi_path = midi["path"]
+        final_wav = midi_path.replace(".mid", "_final.wav")
+        key = cache_key("mix", *vocal_parts, synth_id, SINGING_TIER, lyrics, tts.digest())
+        # A copy, not a hard link: cache hits touch the entry's mtime, and the
+        # download formats (transcode) and ETags go by the final WAV's mtime
+        path = _cached_file("mix", key, final_wav, lambda: merge_audio(instrumental, singing, final_wav), copy=True)
+
+        # The streamed instrumental is an intermediate too (the cache keeps its own copy)
+        if isinstance(instrumental, str) and not DEBUG_INTERMEDIATES and os.path.exists(instrumental):
+            os.remove(instrumental)
+        return path
+
+    # Instrumental render and lyrics → TTS → singing run side by side
+    started = time.perf_counter()
+    results, timings = run_dag(
+        [
+            Stage("nlp", nlp),
+            Stage("midi", midi, deps=("nlp",)),
+            Stage("instrumental", instrumental, deps=("midi",)),
+            Stage("lyrics", lyrics, deps=("nlp", "midi")),
+            Stage("tts", tts, deps=("lyrics", "midi")),
+            Stage("singing", singing, deps=("tts", "midi", "lyrics")),
+            Stage("mix", mix, deps=("instrumental", "singing", "midi", "lyrics", "tts")),
+        ],
+        max_workers=PIPELINE_THREADS,
+        on_stage=on_stage,
+    )
+
+    timings["total"] = round(time.perf_counter() - started, 3)
+
+    analysis = results["nlp"]
+    midi_path, duration = results["midi"]["path"], results["midi"]["duration"]
+
+    return {
+        "prompt": prompt,
+        "emotion": analysis["emotion"],
+        "genre": genre,
+        "tempo": analysis["music_features"]["tempo"],
+        "scale": analysis["music_features"]["scale"],
+        "midi_path": midi_path,
+        "wav_path": results["mix"],
+        "duration": duration,
+        "lyrics": results["lyrics"],
+        # Line start / end seconds on the speech track (before the singing stretch)
+        "lyrics_timing": vocal_timing,
+        "timings": timings,
+        "cache": hits,
+    }
+
+
+# ===================== STREAMING =====================
+# Runs the pipeline in a background thread and yields (kind, payload) events:
+#   ("progress", {"stage", "event"}), ("audio", (name, AudioBuffer)),
+#   ("result", result dict). Instrumental blocks arrive while the vocal
+#   branch is still running; the final mix is streamed after "result".
+def stream_generation(prompt: str, genre: str = "lofi", voice: str = "male", duration: float = DEFAULT_DURATION):
+    events = queue.Queue()
+
+    def on_stage(name, event):
+        events.put(("progress", {"stage": name, "event": event}))
+
+    def on_audio(name, buf):
+        events.put(("audio", (name, buf)))
+
+    def worker():
+        try:
+            events.put(("result", run_generation(prompt, genre, voice, on_stage=on_stage, on_audio=on_audio,
+                                                 duration=duration)))
+        except Exception as e:
+            events.put(("error", e))
+
+    threading.Thread(target=worker, daemon=True).start()
+
+    while True:
+        kind, payload = events.get()
+        if kind == "error":
+            raise payload
+
+        yield kind, payload
+
+        if kind == "result":
+            for block in read_blocks(payload["wav_path"], BLOCK_SECONDS):
+                yield "audio", ("mix", block)
+            return
@@ -1,26 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 import re
 
-from app.database import SessionLocal
-from app.models.user import User
+from app import crud
+from app.database import get_async_db
+from app.passwords import hash_password, verify_password
 
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-# ===================== DB =====================
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # ===================== VALIDATIONS =====================
 def _validate_email(email: str) -> bool:
     pattern = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
@@ -37,7 +26,7 @@ def _validate_password(password: str) -> str | None:
     return None
 
 @router.post("/register")
-def register_user(data: dict, db: Session = Depends(get_db)):
+async def register_user(data: dict, db: AsyncSession = Depends(get_async_db)):
     username = (data.get("username") or "").strip()
     email = (data.get("email") or "").strip().lower()
     password = data.get("password") or ""
@@ -52,21 +41,18 @@ def register_user(data: dict, db: Session = Depends(get_db)):
     if pw_error:
         raise HTTPException(status_code=400, detail=pw_error)
 
-    existing = db.query(User).filter(User.email == email).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Email is already registered")
-
-    password_hash = pwd_context.hash(password)
-
-    user = User(
-        username=username,          # ✅ FIXED
-        email=email,
-        password_hash=password_hash
-    )
+    password_hash = await hash_password(password)
 
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    # The unique index on email rejects duplicates, no lookup needed first
+    try:
+        user = await crud.create_user(db, {
+            "username": username,          # ✅ FIXED
+            "email": email,
+            "password_hash": password_hash
+        })
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email is already registered")
 
     return {
         "id": user.id,
@@ -76,20 +62,28 @@ def register_user(data: dict, db: Session = Depends(get_db)):
     }
 
 @router.post("/login")
-def login_user(data: dict, db: Session = Depends(get_db)):
+async def login_user(data: dict, db: AsyncSession = Depends(get_async_db)):
     email = (data.get("email") or "").strip().lower()
     password = data.get("password") or ""
 
     if not _validate_email(email):
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
-    user = db.query(User).filter(User.email == email).first()
+    user = await crud.get_user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
-    if not pwd_context.verify(password, user.password_hash):
+    # Hand the connection back to the pool while waiting for bcrypt
+    await db.close()
+
+    ok, new_hash = await verify_password(password, user.password_hash)
+    if not ok:
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
+    # Transparent rehash when the cost parameters changed
+    if new_hash:
+        await crud.update_password_hash(db, user.id, new_hash)
+
     return {
         "id": user.id,
         "email": user.email,
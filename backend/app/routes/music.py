@@ -1,167 +1,120 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from datetime import datetime
+import asyncio
+import base64
+import binascii
+import json
 import os
 import traceback
 
-from app.database import SessionLocal
+import numpy as np
+
+from app import crud
+from app.audio.transcode import FORMATS, content_etag, sibling_paths, transcode
+from app.database import SessionLocal, get_async_db
 from app.models.music import MusicGeneration
-from app.nlp.pipeline import process_text
-from app.music.generator import generate_music
-from app.lyrics.generator import generate_lyrics
-from app.audio.converter import midi_to_wav
-from app.audio.mixer import merge_audio
-from app.audio.tts import generate_speech
-from app.audio.singing import speech_to_singing
+from app.music.generator import DEFAULT_DURATION, MAX_DURATION, MIN_DURATION
+from app.pipeline.runner import STAGES, run_generation, stream_generation
+from app.pipeline.batch import MAX_BATCH_ITEMS, prepare_batch
+from app.pipeline.jobs import QueueFullError, job_queue
 
 
 router = APIRouter(prefix="/music", tags=["Music"])
 
 
-# ===================== DB =====================
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-# ===================== LYRICS → TTS PREP =====================
-def prepare_lyrics_for_tts(lyrics: str) -> str:
-    lines = [l.strip() for l in lyrics.split("\n") if l.strip()]
-
-    verse, chorus, bridge = [], [], []
-    current = None
-
-    for line in lines:
-        lower = line.lower()
-        if lower.startswith("verse"):
-            current = verse
-            continue
-        elif lower.startswith("chorus"):
-            current = chorus
-            continue
-        elif lower.startswith("bridge"):
-            current = bridge
-            continue
-
-        if current is not None:
-            current.append(line)
+# ===================== REQUEST =====================
+def _parse_generate_request(data: dict):
+    prompt = (data.get("prompt") or "").strip()
+    voice = data.get("voice", "male")
+    genre = data.get("genre", "lofi")
 
-    def speak_block(block):
-        return "\n".join(b + "..." for b in block)
+    if not prompt:
+        raise HTTPException(status_code=400, detail="Prompt is required")
 
-    tts_text = ""
+    if voice not in ("male", "female"):
+        voice = "male"
 
-    if verse:
-        tts_text += speak_block(verse) + "\n\n"
-    if chorus:
-        tts_text += speak_block(chorus) + "\n\n"
-        tts_text += speak_block(chorus) + "\n\n"
-    if bridge:
-        tts_text += speak_block(bridge) + "\n\n"
-    if chorus:
-        tts_text += speak_block(chorus)
+    if genre not in ("lofi", "pop", "classical"):
+        genre = "lofi"
 
-    return tts_text.strip()
+    return prompt, voice, genre, _parse_duration(data)
 
 
-# ===================== GENERATE =====================
-@router.post("/generate")
-def generate_music_api(data: dict, db: Session = Depends(get_db)):
+def _parse_duration(data: dict) -> int:
+    # Seconds; whole numbers keep cache keys stable ("180" == 180 == 180.0)
+    duration = data.get("duration")
+    if duration is None:
+        return DEFAULT_DURATION
     try:
-        prompt = (data.get("prompt") or "").strip()
-        voice = data.get("voice", "male")
-        genre = data.get("genre", "lofi")
+        duration = round(float(duration))
+    except (TypeError, ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail="duration must be a number of seconds")
+
+    if not MIN_DURATION <= duration <= MAX_DURATION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"duration must be between {MIN_DURATION} and {MAX_DURATION:g} seconds",
+        )
+    return duration
 
-        if not prompt:
-            raise HTTPException(status_code=400, detail="Prompt is required")
 
-        if voice not in ("male", "female"):
-            voice = "male"
+# ===================== SAVE =====================
+def _user_id(data: dict):
+    user_id = data.get("user_id")
+    return int(user_id) if str(user_id or "").isdigit() else None
 
-        if genre not in ("lofi", "pop", "classical"):
-            genre = "lofi"
 
-        # 🧠 NLP
-        analysis = process_text(prompt)
+def _result_row(result: dict, user_id: int = None) -> dict:
+    return {
+        "user_id": user_id,
+        "prompt": result["prompt"],
+        "emotion": result["emotion"],
+        "genre": result["genre"],
+        "tempo": result["tempo"],
+        "scale": result["scale"],
+        "midi_path": result["midi_path"],
+        "wav_path": result["wav_path"],
+        "duration": result["duration"],
+        "lyrics": result["lyrics"],
+        "status": "completed"
+    }
 
-        # 🎵 MIDI generation (GENRE AWARE)
-        midi_path, duration = generate_music(
-            analysis["music_features"],
-            prompt,
-            genre=genre
-        )
 
-        # 🔊 MIDI → WAV
-        instrumental_wav = midi_to_wav(
-            midi_path,
-            midi_path.replace(".mid", "_instrumental.wav")
-        )
+def _save_result(db: Session, result: dict, user_id: int = None) -> MusicGeneration:
+    record = MusicGeneration(**_result_row(result, user_id))
 
-        if not os.path.exists(instrumental_wav):
-            raise HTTPException(500, "Instrumental audio generation failed")
-
-        # ✍️ Lyrics
-        lyrics = generate_lyrics(
-            prompt,
-            analysis["emotion"],
-            duration
-        )
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    return record
 
-        # 🎤 Lyrics → TTS
-        tts_text = prepare_lyrics_for_tts(lyrics)
 
-        speech_wav = generate_speech(
-            tts_text,
-            midi_path.replace(".mid", "_speech.wav"),
-            voice=voice,
-        )
-
-        if not os.path.exists(speech_wav):
-            raise HTTPException(500, "TTS audio generation failed")
+# ===================== GENERATE =====================
+# The pipeline is CPU-bound: it runs in the threadpool, never on the event loop
+@router.post("/generate")
+async def generate_music_api(data: dict, db: AsyncSession = Depends(get_async_db)):
+    try:
+        prompt, voice, genre, duration = _parse_generate_request(data)
 
-        # 🎶 Singing-style effect (optional)
-        try:
-            vocal_wav = speech_to_singing(
-                speech_wav,
-                midi_path,
-                midi_path.replace(".mid", "_vocal.wav"),
-                voice=voice
-            )
-        except Exception:
-            vocal_wav = speech_wav
-
-        # 🎼 Merge audio
-        final_wav = midi_path.replace(".mid", "_final.wav")
-        wav_path = merge_audio(instrumental_wav, vocal_wav, final_wav)
+        result = await run_in_threadpool(run_generation, prompt, genre=genre, voice=voice, duration=duration)
 
         # 💾 Save DB
-        record = MusicGeneration(
-            prompt=prompt,
-            emotion=analysis["emotion"],
-            genre=genre,
-            tempo=analysis["music_features"]["tempo"],
-            scale=analysis["music_features"]["scale"],
-            midi_path=midi_path,
-            wav_path=wav_path,
-            duration=duration,
-            lyrics=lyrics,
-            status="completed"
-        )
-
-        db.add(record)
-        db.commit()
-        db.refresh(record)
+        record = await crud.create_music(db, _result_row(result, _user_id(data)))
 
         return {
             "id": record.id,
             "prompt": prompt,
             "genre": genre,
-            "duration": duration,
-            "lyrics": lyrics,
-            "wav_path": wav_path
+            "duration": result["duration"],
+            "lyrics": result["lyrics"],
+            "lyrics_timing": result["lyrics_timing"],
+            "wav_path": result["wav_path"],
+            "timings": result["timings"],
+            "cache": result["cache"]
         }
 
     except HTTPException:
@@ -171,12 +124,223 @@ def generate_music_api(data: dict, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ===================== BATCH GENERATE =====================
+# {"items": [{"prompt", "genre", "voice", "duration"?}, ...], "user_id"?}. NLP, MIDI and
+# lyrics are prepared for the whole batch at once, audio renders in the worker
+# pool, and all successful rows are saved with a single INSERT. Failures are
+# reported per item instead of failing the request.
+@router.post("/generate/batch")
+async def generate_music_batch(data: dict, db: AsyncSession = Depends(get_async_db)):
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="items must be a non-empty list")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+
+    user_id = _user_id(data)
+    results = [{"index": i} for i in range(len(items))]
+
+    valid = []
+    for i, item in enumerate(items):
+        try:
+            prompt, voice, genre, duration = _parse_generate_request(item if isinstance(item, dict) else {})
+            valid.append((i, prompt, genre, voice, duration))
+        except HTTPException as e:
+            results[i]["error"] = e.detail
+
+    prepared = await run_in_threadpool(
+        prepare_batch, [(prompt, genre, duration) for _, prompt, genre, _, duration in valid]
+    )
+
+    pending = []
+    for (i, prompt, genre, voice, duration), pre in zip(valid, prepared):
+        if isinstance(pre, Exception):
+            results[i]["error"] = str(pre)
+            continue
+        try:
+            pending.append((i, asyncio.wrap_future(job_queue.submit_render(prompt, genre, voice, pre, duration))))
+        except QueueFullError as e:
+            results[i]["error"] = str(e)
+
+    rendered = await asyncio.gather(*(f for _, f in pending), return_exceptions=True)
+
+    done = []
+    for (i, _), result in zip(pending, rendered):
+        if isinstance(result, BaseException):
+            print("".join(traceback.format_exception(result)))
+            results[i]["error"] = str(result) or type(result).__name__
+        else:
+            done.append((i, result))
+
+    # 💾 Save DB (one bulk insert)
+    ids = await crud.bulk_create_music(db, [_result_row(result, user_id) for _, result in done])
+
+    for (i, result), music_id in zip(done, ids):
+        results[i].update({
+            "id": music_id,
+            "prompt": result["prompt"],
+            "genre": result["genre"],
+            "duration": result["duration"],
+            "lyrics": result["lyrics"],
+            "lyrics_timing": result["lyrics_timing"],
+            "wav_path": result["wav_path"],
+            "timings": result["timings"],
+            "cache": result["cache"]
+        })
+
+    return {"results": results}
+
+
+# ===================== STREAMING GENERATE =====================
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _pcm_chunk(buf, seq: int) -> dict:
+    pcm = (np.clip(buf.samples, -1.0, 1.0) * 32767).astype("<i2")
+    return {
+        "seq": seq,
+        "sample_rate": buf.sample_rate,
+        "channels": buf.channels,
+        "format": "pcm_s16le",
+        "data": base64.b64encode(pcm.tobytes()).decode("ascii"),
+    }
+
+
+# Server-Sent Events: "progress" per stage, "instrumental" PCM chunks as soon
+# as FluidSynth renders them, then "mix" chunks of the final song and "done".
+@router.post("/generate/stream")
+def generate_music_stream(data: dict):
+    prompt, voice, genre, duration = _parse_generate_request(data)
+
+    def events():
+        seq = {"instrumental": 0, "mix": 0}
+        try:
+            for kind, payload in stream_generation(prompt, genre=genre, voice=voice, duration=duration):
+                if kind == "progress":
+                    yield _sse("progress", payload)
+                elif kind == "audio":
+                    name, buf = payload
+                    yield _sse(name, _pcm_chunk(buf, seq[name]))
+                    seq[name] += 1
+                elif kind == "result":
+                    result = payload
+                    db = SessionLocal()
+                    try:
+                        record = _save_result(db, result, _user_id(data))
+                    finally:
+                        db.close()
+
+            yield _sse("done", {
+                "id": record.id,
+                "prompt": prompt,
+                "genre": genre,
+                "duration": result["duration"],
+                "lyrics": result["lyrics"],
+                "lyrics_timing": result["lyrics_timing"],
+                "wav_path": result["wav_path"],
+                "timings": result["timings"],
+                "cache": result["cache"]
+            })
+        except Exception as e:
+            print(traceback.format_exc())
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ===================== JOBS =====================
+@router.post("/jobs", status_code=202)
+async def submit_music_job(data: dict, db: AsyncSession = Depends(get_async_db)):
+    prompt, voice, genre, duration = _parse_generate_request(data)
+
+    record = await crud.create_music(db, {
+        "prompt": prompt, "genre": genre, "status": "queued", "user_id": _user_id(data)
+    })
+
+    try:
+        job_queue.submit(record.id, prompt, genre, voice, duration)
+    except QueueFullError as e:
+        await crud.delete_music(db, record)
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {"job_id": record.id, "status": record.status}
+
+
+@router.get("/jobs/{job_id}")
+async def get_music_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    record = await crud.get_music(db, job_id)
+
+    if not record:
+        raise HTTPException(404, "Job not found")
+
+    job = {
+        "job_id": record.id,
+        "status": record.status,
+        "stage": record.stage,
+        "progress": record.progress,
+        "stages": list(STAGES),
+    }
+
+    if record.status == "failed":
+        job["error"] = record.error
+
+    if record.status == "completed":
+        job.update({
+            "id": record.id,
+            "prompt": record.prompt,
+            "genre": record.genre,
+            "duration": record.duration,
+            "lyrics": record.lyrics,
+            "wav_path": record.wav_path
+        })
+
+    return job
+
+
 # ===================== LIST =====================
+# Keyset pagination: newest first, the cursor is the (created_at, id) of the
+# last row returned, sent back in the X-Next-Cursor header. Lyrics are left
+# out of the listing; GET /music/{id} returns the full record.
+
+
+def _encode_cursor(created_at: datetime, music_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{music_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, music_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(music_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+
+
 @router.get("/")
-def list_music(db: Session = Depends(get_db)):
-    records = db.query(MusicGeneration).order_by(
-        MusicGeneration.created_at.desc()
-    ).all()
+async def list_music(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str = None,
+    emotion: str = None,
+    genre: str = None,
+    user_id: int = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    after = _decode_cursor(cursor) if cursor else None
+
+    # One extra row tells us whether another page exists
+    rows = await crud.list_music_page(
+        db, limit + 1, after=after, emotion=emotion, genre=genre, user_id=user_id
+    )
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at, rows[-1].id)
 
     return [
         {
@@ -188,43 +352,92 @@ def list_music(db: Session = Depends(get_db)):
             "scale": r.scale,
             "wav_path": r.wav_path,
             "duration": r.duration,
-            "lyrics": r.lyrics,
             "created_at": r.created_at.isoformat()
         }
-        for r in records
+        for r in rows
     ]
 
 
+@router.get("/{music_id}")
+async def get_music(music_id: int, db: AsyncSession = Depends(get_async_db)):
+    record = await crud.get_music(db, music_id)
+
+    if not record or record.status != "completed":
+        raise HTTPException(404, "Not found")
+
+    return {
+        "id": record.id,
+        "user_id": record.user_id,
+        "prompt": record.prompt,
+        "emotion": record.emotion,
+        "genre": record.genre,
+        "tempo": record.tempo,
+        "scale": record.scale,
+        "wav_path": record.wav_path,
+        "duration": record.duration,
+        "lyrics": record.lyrics,
+        "created_at": record.created_at.isoformat()
+    }
+
+
 # ===================== DOWNLOAD =====================
+# ?format=wav|flac|ogg|opus. Compressed copies are encoded once and kept next
+# to the WAV. ETags come from the file content, so players can revalidate with
+# If-None-Match; Range requests (seeking) are served by FileResponse.
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
 @router.get("/download/wav/{music_id}")
-def download_wav(music_id: int, db: Session = Depends(get_db)):
-    record = db.query(MusicGeneration).get(music_id)
+@router.get("/download/{music_id}")
+async def download_wav(
+    music_id: int,
+    request: Request,
+    format: str = Query("wav"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if format not in FORMATS:
+        raise HTTPException(400, f"Unsupported format, choose from {sorted(FORMATS)}")
+
+    record = await crud.get_music(db, music_id)
 
     if not record or not record.wav_path or not os.path.exists(record.wav_path):
         raise HTTPException(404, "WAV not found")
 
+    path = await run_in_threadpool(transcode, record.wav_path, format)
+    etag = await run_in_threadpool(content_etag, path)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
     return FileResponse(
-        record.wav_path,
-        media_type="audio/wav",
-        filename=os.path.basename(record.wav_path)
+        path,
+        media_type=FORMATS[format]["media_type"],
+        filename=os.path.basename(path),
+        headers=headers
     )
 
 
 # ===================== DELETE =====================
+def _remove_files(*paths):
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
 @router.delete("/{music_id}")
-def delete_music(music_id: int, db: Session = Depends(get_db)):
-    record = db.query(MusicGeneration).get(music_id)
+async def delete_music(music_id: int, db: AsyncSession = Depends(get_async_db)):
+    record = await crud.get_music(db, music_id)
 
     if not record:
         raise HTTPException(404, "Not found")
 
-    if record.wav_path and os.path.exists(record.wav_path):
-        os.remove(record.wav_path)
+    siblings = sibling_paths(record.wav_path) if record.wav_path else []
+    await run_in_threadpool(_remove_files, record.wav_path, record.midi_path, *siblings)
 
-    if record.midi_path and os.path.exists(record.midi_path):
-        os.remove(record.midi_path)
-
-    db.delete(record)
-    db.commit()
+    await crud.delete_music(db, record)
 
     return {"message": "Deleted successfully"}
@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# ===================== AUTH THROUGHPUT BENCHMARK =====================
+# Concurrent logins against the real app (in-process ASGI, throwaway SQLite),
+# while a probe keeps hitting GET /music/ to show whether hashing stalls
+# unrelated requests.
+#   cd backend && python benchmarks/bench_auth.py --users 20 --logins 200 --concurrency 32
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+
+
+async def _probe(client, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/music/", params={"limit": 10})
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+
+
+async def run(users: int, logins: int, concurrency: int):
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        accounts = [(f"bench{i}@example.com", f"password{i}") for i in range(users)]
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            client.post("/auth/register", json={"username": f"bench{i}", "email": email, "password": pw})
+            for i, (email, pw) in enumerate(accounts)
+        ))
+        register_time = time.perf_counter() - start
+
+        gate = asyncio.Semaphore(concurrency)
+        login_latencies, probe_latencies = [], []
+
+        async def login(i):
+            email, pw = accounts[i % users]
+            async with gate:
+                t = time.perf_counter()
+                r = await client.post("/auth/login", json={"email": email, "password": pw})
+                login_latencies.append(time.perf_counter() - t)
+                assert r.status_code == 200, r.text
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, stop, probe_latencies))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(logins)))
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await probe
+
+    print(f"bcrypt rounds       : {os.environ['BCRYPT_ROUNDS']}")
+    print(f"hashing workers     : {os.environ.get('PASSWORD_WORKERS', 'default')}")
+    print(f"register {users:5d} users : {register_time:.2f}s")
+    print(f"logins              : {logins} @ concurrency {concurrency}")
+    print(f"throughput          : {logins / elapsed:.1f} logins/s")
+    print(f"login latency       : p50 {_pct(login_latencies, 0.5):.1f} ms, p95 {_pct(login_latencies, 0.95):.1f} ms")
+    print(f"GET /music/ latency : p50 {_pct(probe_latencies, 0.5):.1f} ms, p95 {_pct(probe_latencies, 0.95):.1f} ms "
+          f"({len(probe_latencies)} probes, mean {statistics.fmean(probe_latencies) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auth throughput under concurrent load")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=10, help="BCRYPT_ROUNDS for this run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_auth_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+
+    asyncio.run(run(args.users, args.logins, args.concurrency))
@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# ===================== SONG LENGTH BENCHMARK =====================
+# Composes, renders (streamed to disk) and mixes the instrumental for songs of
+# increasing length. Cost per minute of audio should stay flat (linear total
+# time) and peak memory should not grow with the song. Fails if the longest
+# song costs more than --max-ratio times the shortest per minute, or peaks
+# at more than --max-ratio times its memory.
+#   cd backend && python benchmarks/bench_duration.py --durations 60 180 300 600
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _measure(fn):
+    # (seconds, peak MB of Python / NumPy allocations) for one call
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def run(durations, backend: str, workdir: str):
+    from app.audio.buffer import AudioBuffer
+    from app.audio.converter import midi_to_wav
+    from app.audio.mixer import merge_audio
+    from app.music.generator import compose_score
+
+    features = {"emotion": "happy", "scale": "major"}
+    # Fixed 30 s vocal, as the vocal branch does not depend on this benchmark
+    t = np.arange(30 * 22050) / 22050
+    vocal = AudioBuffer((0.2 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), 22050)
+
+    rows = []
+    for duration in durations:
+        midi_path = os.path.join(workdir, f"song_{duration}.mid")
+        inst_path = midi_path.replace(".mid", "_instrumental.wav")
+        final_path = midi_path.replace(".mid", "_final.wav")
+        box = {}
+
+        def compose():
+            box["score"] = compose_score(features, "benchmark song", "pop", duration)
+            box["score"].write_midi(midi_path)
+
+        compose_s, compose_mb = _measure(compose)
+        render_s, render_mb = _measure(lambda: midi_to_wav(box["score"], inst_path, backend=backend))
+        mix_s, mix_mb = _measure(lambda: merge_audio(inst_path, vocal, final_path))
+
+        total = compose_s + render_s + mix_s
+        rows.append({
+            "duration": duration,
+            "notes": len(box["score"]),
+            "compose": compose_s,
+            "render": render_s,
+            "mix": mix_s,
+            "per_minute": total / (duration / 60),
+            "peak_mb": max(compose_mb, render_mb, mix_mb),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generation cost vs song length")
+    parser.add_argument("--durations", type=int, nargs="+", default=[60, 180, 300, 600])
+    parser.add_argument("--backend", default=os.getenv("SYNTH_BACKEND", "additive"))
+    parser.add_argument("--max-ratio", type=float, default=1.5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_duration_")
+    durations = sorted(args.durations)
+    run(durations[:1], args.backend, workdir)  # warm up: imports, synth tables, resampler filters
+    rows = run(durations, args.backend, workdir)
+
+    print(f"backend: {args.backend}")
+    print(f"{'length':>7} {'notes':>6} {'compose':>8} {'render':>8} {'mix':>7} {'s/min':>7} {'peak MB':>8}")
+    for r in rows:
+        print(f"{r['duration']:6d}s {r['notes']:6d} {r['compose']:7.3f}s {r['render']:7.2f}s {r['mix']:6.2f}s "
+              f"{r['per_minute']:7.3f} {r['peak_mb']:8.1f}")
+
+    first, last = rows[0], rows[-1]
+    time_ratio = last["per_minute"] / first["per_minute"]
+    memory_ratio = last["peak_mb"] / max(first["peak_mb"], 1e-9)
+    print(f"\n{last['duration']}s vs {first['duration']}s: cost per minute x{time_ratio:.2f}, peak memory x{memory_ratio:.2f}")
+
+    if time_ratio > args.max_ratio or memory_ratio > args.max_ratio:
+        print("❌ not linear")
+        sys.exit(1)
+    print("✅ linear time, flat memory")
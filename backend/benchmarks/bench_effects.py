@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# ===================== EFFECTS BENCHMARK =====================
+# Real-time factor (processing seconds per second of audio, < 1 is faster
+# than real time) of the effect chains on a one-minute stereo track, plus
+# the peak memory of streaming it through in blocks. Run it pinned to one
+# core to check the single-core budget:
+#   cd backend && taskset -c 0 python benchmarks/bench_effects.py --seconds 60
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+SAMPLE_RATE = 44100
+
+
+def _run(chain, track: np.ndarray, block_size: int):
+    blocks = (track[i:i + block_size] for i in range(0, track.shape[0], block_size))
+    tracemalloc.start()
+    start = time.perf_counter()
+    frames = sum(block.shape[0] for block in chain.stream(blocks, track.shape[1]))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6, frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Real-time factor of the vocal / master effect chains")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--block-size", type=int, default=8192)
+    args = parser.parse_args()
+
+    from app.audio import effects
+
+    rng = np.random.default_rng(0)
+    frames = int(args.seconds * SAMPLE_RATE)
+    # Noise under a slow tremolo, so the dynamics have something to do
+    track = rng.standard_normal((frames, 2)).astype(np.float32) * 0.2
+    track *= (0.6 + 0.4 * np.sin(np.arange(frames) / SAMPLE_RATE * 2 * np.pi * 0.5))[:, None].astype(np.float32)
+
+    chains = {
+        "vocal (EQ, comp, reverb)": effects.vocal_chain,
+        "master (EQ, comp, limiter)": effects.master_chain,
+        "echo (delay, limiter)": effects.echo_chain,
+    }
+    # Warm-up: scipy import and impulse-response spectra, both cached after
+    _run(effects.vocal_chain(SAMPLE_RATE, 2), track[:SAMPLE_RATE], args.block_size)
+
+    print(f"{args.seconds:.0f}s stereo @ {SAMPLE_RATE} Hz, {args.block_size}-frame blocks")
+    total = 0.0
+    for name, make in chains.items():
+        elapsed, peak_mb, out_frames = _run(make(SAMPLE_RATE, 2), track, args.block_size)
+        total += elapsed
+        print(f"  {name:28s} {elapsed:6.2f}s  RTF {elapsed / args.seconds:.3f}  "
+              f"peak {peak_mb:5.1f} MB  (+{(out_frames - frames) / SAMPLE_RATE:.2f}s tail)")
+    print(f"\nall chains: RTF {total / args.seconds:.3f}")
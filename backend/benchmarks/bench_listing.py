@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# ===================== LISTING PAGINATION BENCHMARK =====================
+# Times paging through GET /music/ by X-Next-Cursor over rows that share one
+# created_at second (batch inserts on SQLite always do). That every row comes
+# back exactly once is covered by tests/test_listing.py.
+#   cd backend && python benchmarks/bench_listing.py --rows 500 --limit 50
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+async def run(rows: int, limit: int):
+    import httpx
+    from app import crud
+    from app.database import AsyncSessionLocal
+    from app.main import app
+
+    async with AsyncSessionLocal() as db:
+        await crud.bulk_create_music(db, [
+            {"prompt": f"song {i}", "emotion": "calm", "genre": "lofi", "status": "completed"}
+            for i in range(rows)
+        ])
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        seen, pages, cursor = [], 0, None
+        start = time.perf_counter()
+        while True:
+            params = {"limit": limit} if cursor is None else {"limit": limit, "cursor": cursor}
+            r = await client.get("/music/", params=params)
+            r.raise_for_status()
+            seen += [item["id"] for item in r.json()]
+            pages += 1
+            cursor = r.headers.get("X-Next-Cursor")
+            if cursor is None or pages > rows:
+                break
+        elapsed = time.perf_counter() - start
+
+    print(f"{rows} same-second rows, limit {limit}: {pages} pages, {len(seen)} rows returned")
+    print(f"per page: {elapsed / pages * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keyset pagination over same-second rows")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_listing_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    asyncio.run(run(args.rows, args.limit))
@@ -0,0 +1,80 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# ===================== SINGING TIER BENCHMARK =====================
+# Real-time factor (processing seconds per second of vocal, lower is better)
+# of each singing tier, single process and with the chunked analysis spread
+# over a process pool. Uses a synthetic voiced signal unless --wav is given.
+#   cd backend && python benchmarks/bench_singing.py --seconds 60 --workers 1 4
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def synthetic_voice(seconds: float, sr: int = 22050) -> np.ndarray:
+    # Harmonic "speech": gliding F0 with vibrato, syllable-rate envelope and
+    # short unvoiced noise bursts between syllables
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    f0 = 130 + 25 * np.sin(2 * np.pi * 0.3 * t) + 3 * np.sin(2 * np.pi * 5.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 25))
+
+    syllables = np.clip(np.sin(2 * np.pi * 4.0 * t), 0, None) ** 0.5
+    noise = rng.normal(0, 0.05, len(t)) * (syllables < 0.1)
+    return (0.3 * voiced * syllables + noise).astype(np.float32)
+
+
+def run(speech, score, tiers, workers_list, repeats: int):
+    from app.audio.singing import sing
+    from app.audio.tts_to_singing import tts_to_singing
+
+    rows = []
+    for tier in tiers:
+        for workers in ([1] if tier == "echo" else workers_list):
+            def once():
+                if tier == "echo":
+                    return sing(speech, score, tier="echo")
+                return tts_to_singing(speech, score, tier=tier, workers=workers)
+
+            once()  # warm up (imports, worker processes)
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                out = once()
+                times.append(time.perf_counter() - start)
+            best = min(times)
+            rows.append((tier, workers, best, best / speech.duration, out.duration))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Singing synthesis speed per tier")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--wav", help="use this speech recording instead of a synthetic voice")
+    parser.add_argument("--tiers", nargs="+", default=["echo", "fast", "quality"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--repeats", type=int, default=2)
+    args = parser.parse_args()
+
+    from app.audio.buffer import AudioBuffer
+    from app.music.generator import compose_score
+
+    if args.wav:
+        speech = AudioBuffer.read(args.wav).to_mono()
+    else:
+        speech = AudioBuffer(synthetic_voice(args.seconds), 22050)
+    score = compose_score({"emotion": "calm", "scale": "major"}, "benchmark song", "lofi",
+                          duration=max(10, int(speech.duration / 0.88) + 1))
+
+    rows = run(speech, score, args.tiers, sorted(set(args.workers)), args.repeats)
+
+    print(f"vocal: {speech.duration:.1f}s @ {speech.sample_rate} Hz, {os.cpu_count()} CPUs")
+    print(f"{'tier':>8} {'workers':>7} {'seconds':>8} {'RTF':>7} {'output':>7}")
+    for tier, workers, seconds, rtf, out_seconds in rows:
+        print(f"{tier:>8} {workers:7d} {seconds:8.2f} {rtf:7.3f} {out_seconds:6.1f}s")
+
+    from app.audio.singing import shutdown
+    shutdown()
@@ -0,0 +1,74 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# ===================== STARTUP BENCHMARK =====================
+# Time to `import app.main` in a fresh interpreter (what every uvicorn start
+# and every spawned pipeline worker pays). Fails when the median exceeds the
+# budget, and lists the slowest imports to show what to make lazy.
+#   cd backend && python benchmarks/bench_startup.py --runs 5 --budget-ms 1500
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def _run_once(env: dict, importtime: bool = False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", "import app.main"]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        sys.exit(f"import app.main failed:\n{proc.stderr}")
+    return elapsed, proc.stderr
+
+
+def _baseline(env: dict) -> float:
+    # Bare interpreter start, subtracted so the number is import cost only
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def _slowest(importtime_log: str, top: int):
+    # Cumulative time of top-level third-party packages and our own modules
+    rows = []
+    for m in _IMPORTTIME.finditer(importtime_log):
+        self_us, cumulative_us, indent, module = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        if len(indent) <= 3 or module.startswith("app."):
+            rows.append((cumulative_us, self_us, module))
+    return sorted(rows, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import time of app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+
+    _run_once(env)  # warm the OS page cache and .pyc files
+    base = statistics.median(_baseline(env) for _ in range(3))
+    times = [_run_once(env)[0] - base for _ in range(args.runs)]
+    median_ms = statistics.median(times) * 1000
+
+    _, log = _run_once(env, importtime=True)
+    print("slowest imports (cumulative ms / self ms):")
+    for cumulative_us, self_us, module in _slowest(log, args.top):
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {module}")
+
+    print(f"\nimport app.main: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(times) * 1000:.0f}, max {max(times) * 1000:.0f}), budget {args.budget_ms:.0f} ms")
+
+    if median_ms > args.budget_ms:
+        print("❌ over budget")
+        sys.exit(1)
+    print("✅ within budget")
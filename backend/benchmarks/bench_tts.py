@@ -0,0 +1,107 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ===================== TTS THROUGHPUT BENCHMARK =====================
+# TTS calls per second, before and after the engine pool:
+#   legacy: the old generate_speech, which launched `python -m edge_tts` per
+#           call and, when that failed, re-initialized pyttsx3 every time
+#   pooled: synthesize_speech with one long-lived engine per row (each
+#           engine in TTS_ENGINES)
+#   stub:   the deterministic offline engine, for reference
+# Every row names the engine that actually served its calls; a path whose
+# engines cannot run here (no network for Edge, no eSpeak for pyttsx3) is
+# reported as unavailable instead of aborting the run.
+#   cd backend && python benchmarks/bench_tts.py --calls 20 --concurrency 4
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+TEXT = "Walking through the rain tonight... every light is calling out my name..."
+
+
+def legacy_generate_speech(text: str, out_path: str, voice: str = "male") -> str:
+    # generate_speech as it was before the engine pool; returns the engine used
+    from app.audio.tts import PYTTSX3_SETTINGS, _choose_voice, _edge_tts_voice
+
+    try:
+        cmd = [sys.executable, "-m", "edge_tts", "--voice", _edge_tts_voice(voice),
+               "--text", text, "--write-media", out_path, "--format", "riff-24khz-16bit-mono-pcm"]
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        return "edge"
+    except Exception:
+        pass
+
+    import pyttsx3
+
+    engine = pyttsx3.init()
+    for prop, value in PYTTSX3_SETTINGS[voice].items():
+        engine.setProperty(prop, value)
+    voice_id = _choose_voice(engine, voice)
+    if voice_id:
+        engine.setProperty("voice", voice_id)
+    engine.save_to_file(text, out_path)
+    engine.runAndWait()
+    return "pyttsx3"
+
+
+def _legacy_call(i: int) -> str:
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        return legacy_generate_speech(TEXT, path, voice="male" if i % 2 else "female")
+    finally:
+        os.remove(path)
+
+
+def _throughput(fn, calls: int, concurrency: int):
+    # (calls per second, engines that served them), or (None, error) when
+    # the path cannot run on this machine
+    try:
+        fn(0)  # warm up: imports, engine start
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            served = set(pool.map(fn, range(1, calls + 1)))
+    except Exception as e:
+        return None, f"unavailable ({type(e).__name__}: {str(e).splitlines()[0][:80]})"
+    return calls / (time.perf_counter() - start), ",".join(sorted(served))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TTS calls per second, legacy vs pooled engines")
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    from app.audio import tts
+
+    def pooled(name):
+        def call(i):
+            tts.synthesize_speech(TEXT, voice="male" if i % 2 else "female", engines=[name])
+            return name
+        return call
+
+    rows = []
+    if not args.skip_legacy:
+        rows.append(("legacy (subprocess + re-init)", *_throughput(_legacy_call, args.calls, args.concurrency)))
+    for name in [n for n in tts.TTS_ENGINES if n != "stub"] + ["stub"]:
+        label = "stub" if name == "stub" else f"pooled {name}"
+        rows.append((label, *_throughput(pooled(name), args.calls, args.concurrency)))
+    tts.shutdown()
+
+    print(f"{args.calls} calls @ concurrency {args.concurrency}")
+    for label, rate, served in rows:
+        if rate is None:
+            print(f"  {label:32s} {served}")
+        else:
+            print(f"  {label:32s} {rate:8.1f} calls/s  (served by {served})")
+
+    # Like-for-like speedups only: the same engine before and after the pool
+    legacy = rows[0] if not args.skip_legacy else None
+    if legacy and legacy[1] is not None:
+        for label, rate, served in rows[1:]:
+            if rate is not None and served == legacy[2]:
+                print(f"\n{label} vs legacy: x{rate / legacy[1]:.1f}")
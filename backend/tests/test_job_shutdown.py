@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+BACKEND = os.path.join(os.path.dirname(__file__), "..")
+
+# Runs in a fresh interpreter: a job worker that spun up the nested WORLD pool
+# used to hang on exit, so the only honest check is that the process ends.
+SCRIPT = textwrap.dedent("""
+    import numpy as np
+    from app.pipeline.jobs import JobQueue
+
+    def analyze_long_speech():
+        from app.audio import tts_to_singing
+        sr = 16000
+        t = np.arange(int(sr * (tts_to_singing.CHUNK_SECONDS * 2 + 1))) / sr
+        audio = 0.3 * np.sin(2 * np.pi * 150 * t)
+        f0, _, _ = tts_to_singing.analyze(audio, sr, "fast", workers=2)
+        return len(f0)
+
+    if __name__ == "__main__":
+        queue = JobQueue(max_workers=1)
+        print(queue._submit(analyze_long_speech).result())
+        queue.shutdown(wait=False)
+""")
+
+
+def test_queue_exits_after_long_speech_job(tmp_path):
+    script = tmp_path / "long_speech_job.py"
+    script.write_text(SCRIPT)
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(BACKEND))
+    result = subprocess.run([sys.executable, str(script)], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert int(result.stdout.strip()) > 0
@@ -0,0 +1,50 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app import crud
+from app.database import Base
+from app.models import lyrics, music, user  # noqa: F401  (register the tables)
+from app.routes.music import _decode_cursor, _encode_cursor
+
+
+async def _page_through(rows: int, limit: int):
+    # In-memory SQLite; one bulk INSERT stamps every row with the same
+    # func.now() second, stored without the microseconds a bound datetime has
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    Session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as db:
+        ids = await crud.bulk_create_music(db, [
+            {"prompt": f"song {i}", "emotion": "calm", "genre": "lofi", "status": "completed"}
+            for i in range(rows)
+        ])
+        assert len({row.created_at for row in await crud.list_music_page(db, rows)}) == 1
+
+        # Same loop as GET /music/: one extra row, cursor through encode/decode
+        seen, pages, after = [], 0, None
+        while pages <= rows:
+            page = await crud.list_music_page(db, limit + 1, after=after)
+            pages += 1
+            seen += [row.id for row in page[:limit]]
+            if len(page) <= limit:
+                break
+            after = _decode_cursor(_encode_cursor(page[limit - 1].created_at, page[limit - 1].id))
+
+    await engine.dispose()
+    return ids, seen, pages
+
+
+def test_same_second_rows_page_once_each():
+    ids, seen, pages = asyncio.run(_page_through(rows=23, limit=5))
+    assert pages == 5
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_page_boundary_on_last_row():
+    ids, seen, pages = asyncio.run(_page_through(rows=10, limit=5))
+    assert pages == 2
+    assert seen == sorted(ids, reverse=True)
@@ -0,0 +1,38 @@
+import pytest
+
+from app.nlp.pipeline import process_text, process_texts
+from app.nlp.tokenizer import inflections
+
+
+@pytest.mark.parametrize("prompt, emotion", [
+    ("crying all night", "sad"),
+    ("so much loneliness", "sad"),
+    ("i hated every minute", "angry"),
+    ("raging against the machine", "angry"),
+    ("an exciting party", "happy"),
+    ("quietly drifting", "calm"),
+])
+def test_inflections_match_keywords(prompt, emotion):
+    assert process_text(prompt)["emotion"] == emotion
+
+
+@pytest.mark.parametrize("prompt", [
+    "a song made for summer nights",
+    "a song about my hat",
+    "hats and rags",
+    "tearing down the house",
+])
+def test_unrelated_words_stay_neutral(prompt):
+    assert process_text(prompt)["emotion"] == "neutral"
+
+
+@pytest.mark.parametrize("keyword, unrelated", [
+    ("mad", "made"), ("hate", "hat"), ("hate", "hats"), ("rage", "rag"), ("rage", "rags"), ("tear", "tearing"),
+])
+def test_inflections_exclude_unrelated_words(keyword, unrelated):
+    assert unrelated not in inflections(keyword)
+
+
+def test_batch_matches_single():
+    prompts = ["dancing drummers", "a song about my hat", "peaceful piano", "hated it", "a song about my hat"]
+    assert process_texts(prompts) == [process_text(p) for p in prompts]
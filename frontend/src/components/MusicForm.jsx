@@ -6,6 +6,7 @@ export default function MusicForm({ onGenerated }) {
   const [prompt, setPrompt] = useState("");
   const [genre, setGenre] = useState("lofi");
   const [voice, setVoice] = useState("male");
+  const [duration, setDuration] = useState(60);
   const [loading, setLoading] = useState(false);
 
   const handleSubmit = async (e) => {
@@ -23,6 +24,7 @@ export default function MusicForm({ onGenerated }) {
         prompt,
         genre,
         voice,
+        duration,
       });
 
       if (result) {
@@ -61,6 +63,14 @@ export default function MusicForm({ onGenerated }) {
         <option value="female">Female Voice</option>
       </select>
 
+      {/* Length (seconds) */}
+      <select value={duration} onChange={(e) => setDuration(Number(e.target.value))}>
+        <option value={60}>1 min</option>
+        <option value={180}>3 min</option>
+        <option value={300}>5 min</option>
+        <option value={600}>10 min</option>
+      </select>
+
       <button type="submit" disabled={loading}>
         {loading ? "Generating..." : "Generate Music"}
       </button>
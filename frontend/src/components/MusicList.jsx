@@ -1,22 +1,52 @@
 import { useEffect, useState, useRef } from "react";
-import { listMusic, downloadWav, deleteMusic } from "../services/api";
+import { listMusic, getMusic, downloadWav, deleteMusic } from "../services/api";
 import "./MusicList.css";
 
 export default function MusicList({ refreshFlag }) {
   const [musicList, setMusicList] = useState([]);
   const [playingId, setPlayingId] = useState(null);
   const [openLyricsId, setOpenLyricsId] = useState(null);
+  const [lyricsById, setLyricsById] = useState({});
+  const [nextCursor, setNextCursor] = useState(null);
   const audioRefs = useRef({});
 
   const fetchMusic = async () => {
     try {
-      const data = await listMusic();
-      setMusicList(data || []);
+      const { items, nextCursor } = await listMusic();
+      setMusicList(items || []);
+      setNextCursor(nextCursor);
     } catch (err) {
       console.error("Failed to fetch music", err);
     }
   };
 
+  const loadMore = async () => {
+    try {
+      const { items, nextCursor: cursor } = await listMusic(nextCursor);
+      setMusicList((prev) => [...prev, ...(items || [])]);
+      setNextCursor(cursor);
+    } catch (err) {
+      console.error("Failed to fetch music", err);
+    }
+  };
+
+  // Lyrics are not part of the listing; fetch them the first time they're opened
+  const toggleLyrics = async (id) => {
+    if (openLyricsId === id) {
+      setOpenLyricsId(null);
+      return;
+    }
+    setOpenLyricsId(id);
+    if (lyricsById[id] === undefined) {
+      try {
+        const music = await getMusic(id);
+        setLyricsById((prev) => ({ ...prev, [id]: music.lyrics }));
+      } catch (err) {
+        console.error("Failed to fetch lyrics", err);
+      }
+    }
+  };
+
   useEffect(() => {
     fetchMusic();
   }, [refreshFlag]);
@@ -76,9 +106,7 @@ export default function MusicList({ refreshFlag }) {
 
             <button
               className="btn lyrics"
-              onClick={() =>
-                setOpenLyricsId(openLyricsId === music.id ? null : music.id)
-              }
+              onClick={() => toggleLyrics(music.id)}
             >
               Lyrics
             </button>
@@ -99,7 +127,7 @@ export default function MusicList({ refreshFlag }) {
           {/* LYRICS */}
           {openLyricsId === music.id && (
             <div className="lyrics-box">
-              <pre>{music.lyrics}</pre>
+              <pre>{lyricsById[music.id] ?? "Loading..."}</pre>
             </div>
           )}
 
@@ -110,6 +138,12 @@ export default function MusicList({ refreshFlag }) {
           />
         </div>
       ))}
+
+      {nextCursor && (
+        <button className="btn load-more" onClick={loadMore}>
+          Load more
+        </button>
+      )}
     </div>
   );
 }
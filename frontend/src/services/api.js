@@ -13,18 +13,31 @@ export const generateMusic = async (data) => {
 };
 
 /* ===============================
-   List Generated Music
+   List Generated Music (one page, newest first)
 ================================ */
-export const listMusic = async () => {
-  const response = await axios.get(`${MUSIC_URL}/`);
+export const listMusic = async (cursor = null) => {
+  const params = cursor ? { cursor } : {};
+  const response = await axios.get(`${MUSIC_URL}/`, { params });
+  return {
+    items: response.data,
+    nextCursor: response.headers["x-next-cursor"] || null,
+  };
+};
+
+/* ===============================
+   Single Music (includes lyrics)
+================================ */
+export const getMusic = async (id) => {
+  const response = await axios.get(`${MUSIC_URL}/${id}`);
   return response.data;
 };
 
 /* ===============================
    Download Final WAV
 ================================ */
-export const downloadWav = (id) => {
-  return `${MUSIC_URL}/download/wav/${id}`;
+export const downloadWav = (id, format = "wav") => {
+  const query = format === "wav" ? "" : `?format=${format}`;
+  return `${MUSIC_URL}/download/wav/${id}${query}`;
 };
 
 /* ===============================